@@ -0,0 +1,129 @@
+"""Benchmark the measure pipelines on a deterministic frame source
+
+Runs fixed-length trials of the face, person and fused pipelines on
+generated frames or on a looped video file instead of the webcam and
+prints the throughput and the p50/p95/p99 per-frame latency (capture to
+written) as JSON.
+
+USAGE
+>>> python benchmark.py -n 300 -o ../data/bench/pi3_opencv343.json
+>>> python benchmark.py -s ../data/video/store.mp4 -t fused -b 4
+"""
+
+# import the necessary packages
+import datetime
+import json
+import platform
+import shutil
+import tempfile
+import numpy as np
+import cv2
+import plac
+from utils.datahandler import DataHandler
+from utils.detectors import FaceDetector, PersonDetector
+from utils.pipeline import Pipeline
+from utils.runcontrol import RunControl
+from utils.sources import SyntheticSource, LoopedVideoSource
+
+TRIALS = ['faces', 'persons', 'fused']
+
+
+def make_source(source, n_frames):
+    if source == 'synthetic':
+        return SyntheticSource(n_frames)
+    return LoopedVideoSource(source, n_frames)
+
+
+def run_trial(name, detectors, source, n_frames, batch_size=1):
+    """Runs one pipeline over n_frames and returns its report"""
+    path = tempfile.mkdtemp(prefix='bench_')
+    handlers = []
+    for detector in detectors:
+        results = DataHandler(measure=detector.measure, path=path,
+                              method='csv', start_time=0)
+        results.makefile(verbose=False)
+        handlers.append(results)
+
+    frames = make_source(source, n_frames)
+    control = RunControl(signals=()).start()
+
+    # block so that every trial processes exactly n_frames
+    pipeline = Pipeline(frames, detectors, handlers, control,
+                        policy='block', batch_size=batch_size,
+                        track_latency=True)
+    try:
+        stats = pipeline.run()
+    finally:
+        for results in handlers:
+            results.close(end_time=0)
+        frames.release()
+        shutil.rmtree(path)
+
+    latencies = np.array(pipeline.latencies) * 1000
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    return {
+        'trial': name,
+        'frames': stats['processed'],
+        'elapsed_s': round(stats['elapsed'], 3),
+        'fps': round(stats['fps'], 2),
+        'latency_ms': {'p50': round(float(p50), 2),
+                       'p95': round(float(p95), 2),
+                       'p99': round(float(p99), 2),
+                       'max': round(float(latencies.max()), 2)},
+        'dropped': stats['dropped'],
+        'batches': stats['batches']}
+
+
+@plac.annotations(
+    face_prototxt=("path to face Caffe 'deploy' prototxt file", "option",
+                   "fp"),
+    face_model=("path to face Caffe pre-trained model", "option", "fm"),
+    person_prototxt=("path to person Caffe 'deploy' prototxt file", "option",
+                     "pp"),
+    person_model=("path to person Caffe pre-trained model", "option", "pm"),
+    source=("'synthetic' or a video file that is looped", "option", "s"),
+    n_frames=("frames per trial", "option", "n", int),
+    trials=("comma separated trials: faces, persons, fused", "option", "t"),
+    batch_size=("frames stacked into one forward pass", "option", "b", int),
+    backend=("DNN backend; 'auto' picks the fastest for this host", "option",
+             "B", str),
+    output=("write the JSON report to this file", "option", "o"))
+def main(face_prototxt="models/deploy.prototxt.txt",
+         face_model="models/res10_300x300_ssd_iter_140000.caffemodel",
+         person_prototxt="models/MobileNetSSD_deploy.prototxt.txt",
+         person_model="models/MobileNetSSD_deploy.caffemodel",
+         source='synthetic', n_frames=200, trials=','.join(TRIALS),
+         batch_size=1, backend='default', output=None):
+    """Runs the benchmark trials and prints a JSON report"""
+    print("[INFO] loading models...")
+    face_detector = FaceDetector(face_prototxt, face_model, backend=backend)
+    person_detector = PersonDetector(person_prototxt, person_model,
+                                     backend=backend)
+    pipelines = {'faces': [face_detector],
+                 'persons': [person_detector],
+                 'fused': [face_detector, person_detector]}
+
+    report = {
+        'date': datetime.datetime.utcnow().isoformat(),
+        'host': platform.node(),
+        'machine': platform.machine(),
+        'opencv': cv2.__version__,
+        'backend': backend,
+        'source': source,
+        'batch_size': batch_size,
+        'trials': []}
+    for name in trials.split(','):
+        assert name in pipelines, f"trial must be one of {TRIALS}"
+        print(f"[INFO] running {name} trial...")
+        report['trials'].append(run_trial(name, pipelines[name], source,
+                                          n_frames, batch_size))
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if output is not None:
+        with open(output, 'w') as f:
+            f.write(text + "\n")
+
+
+if __name__ == '__main__':
+    plac.call(main)
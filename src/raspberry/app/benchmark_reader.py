@@ -0,0 +1,179 @@
+"""Regression benchmark of the DataReader processing on multi-hour inputs
+
+Generates synthetic per-frame detection data for sessions of several hours,
+runs the row-wise reference implementations that DataReader used to have and
+the current columnar ones on the same input, checks that both give the same
+output and prints the timings and the speedup as JSON.
+
+USAGE
+>>> python benchmark_reader.py -H 1,4,12
+>>> python benchmark_reader.py -H 12 -o ../data/bench/reader_pi3.json
+>>> python benchmark_reader.py -H 720 -f 1 -c
+"""
+
+# import the necessary packages
+import datetime
+import json
+import platform
+import time
+import numpy as np
+import pandas as pd
+import plac
+from utils.datareader import DataReader
+
+
+def make_raw_data(hours, label, fps=8, rate=0.8, start_time=1539048822,
+                  seed=0):
+    """Returns synthetic raw rows of a session in the csv columns
+
+    Arguments:
+        hours (float): length of the session
+        label (str): 'face' or 'person'
+        fps (int): frames per second
+        rate (float): mean number of detections per frame
+    """
+    rng = np.random.RandomState(seed)
+    n_frames = int(hours * 3600 * fps)
+    per_frame = np.minimum(rng.poisson(rate, n_frames), 4)
+    frame = np.repeat(np.arange(n_frames), per_frame)
+    # the id of a detection is its position in the frame
+    first = np.repeat(np.cumsum(per_frame) - per_frame, per_frame)
+    n = len(frame)
+    startX = rng.randint(0, 300, n)
+    startY = rng.randint(0, 200, n)
+    return pd.DataFrame({
+        'ts': start_time + frame // fps,
+        'label': label,
+        'id': np.arange(n) - first,
+        'confidence': rng.uniform(0.5, 1, n).round(2),
+        'startX': startX,
+        'startY': startY,
+        'endX': startX + rng.randint(20, 100, n),
+        'endY': startY + rng.randint(20, 100, n),
+        'frame': frame,
+        'ns': frame * (10 ** 9 // fps)})
+
+
+def legacy_process_data(raw_df):
+    """The row-wise process_data DataReader used, with the ts read as
+    seconds"""
+    raw_gb_mean = raw_df.groupby(by=['ts', 'id']).mean(
+        numeric_only=True).reset_index()
+    raw_gb_mean['X'] = raw_gb_mean.apply(
+        lambda row: (row['startX'] + row['endX']) / 2, axis=1)
+    raw_gb_mean['Y'] = raw_gb_mean.apply(
+        lambda row: (row['startY'] + row['endY']) / 2, axis=1)
+    raw_gb_mean['dt'] = pd.to_datetime(raw_gb_mean['ts'], unit='s')
+    raw_gb_mean['time_of_day'] = raw_gb_mean['dt'].apply(
+        lambda x: x.strftime('%H:%M:%S'))
+    return raw_gb_mean.drop('dt', axis=1)
+
+
+def legacy_ts_to_timeofday(l_ts):
+    """The per-second loop ts_to_timeofday used"""
+    return [datetime.datetime.utcfromtimestamp(ts).strftime('%H:%M:%S')
+            for ts in l_ts]
+
+
+def legacy_get_htr_data(reader):
+    """The per-second lookups get_htr_data and resolve_extra_faces used"""
+    count_faces = reader.clean_face_data.groupby(by='ts').nunique()
+    count_persons = reader.clean_person_data.groupby(by='ts').nunique()
+    infill_count_faces = [count_faces.loc[ts, 'id']
+                          if ts in count_faces.index
+                          else 0 for ts in reader.x_axis_ts]
+    infill_count_persons = [count_persons.loc[ts, 'id']
+                            if ts in count_persons.index
+                            else 0 for ts in reader.x_axis_ts]
+    htr_df = pd.DataFrame(data={
+        'ts': reader.x_axis_timeofday,
+        'faces': infill_count_faces,
+        'persons': infill_count_persons})
+
+    f_gt_p = htr_df['faces'] > htr_df['persons']
+    for idx, row in htr_df[f_gt_p].iterrows():
+        htr_df.loc[idx, 'faces'] = row['persons']
+    return htr_df
+
+
+def timed(function, *args):
+    """Returns the result of a call and its seconds"""
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def compare(hours, fps=8, legacy=True):
+    """Runs the reference and current implementations on `hours` of data
+    and returns their report
+
+    Arguments:
+        hours (float): length of the session
+        fps (int): frames per second of the synthetic data
+        legacy (bool): also time the reference implementations and check
+            that the outputs match; a month of data takes minutes with them
+    """
+    face_df = make_raw_data(hours, 'face', fps, rate=0.4, seed=0)
+    person_df = make_raw_data(hours, 'person', fps, rate=0.8, seed=1)
+    reader = DataReader(face_df, person_df, read_from='df')
+    trials = []
+
+    def trial(name, reference, function, *args):
+        result, current_s = timed(function, *args)
+        legacy_s = None
+        if legacy:
+            expected, legacy_s = timed(reference, *args)
+            if isinstance(result, pd.DataFrame):
+                pd.testing.assert_frame_equal(result, expected)
+            else:
+                assert result == expected
+        trials.append((name, legacy_s, current_s))
+        return result
+
+    trial('process_data', legacy_process_data, reader.process_data, face_df)
+    # the reader's own views, so get_htr_data times only the counting
+    reader.x_axis_timeofday
+    trial('ts_to_timeofday', legacy_ts_to_timeofday, reader.ts_to_timeofday,
+          reader.x_axis_ts)
+    trial('get_htr_data', legacy_get_htr_data,
+          lambda reader: reader.make_htr_data(), reader)
+
+    return {
+        'hours': hours,
+        'rows': len(face_df) + len(person_df),
+        'trials': [{'name': name,
+                    'legacy_s': None if legacy_s is None
+                    else round(legacy_s, 4),
+                    'current_s': round(current_s, 4),
+                    'speedup': None if legacy_s is None
+                    else round(legacy_s / current_s, 1)}
+                   for (name, legacy_s, current_s) in trials]}
+
+
+@plac.annotations(
+    hours=("comma separated session lengths in hours", "option", "H"),
+    fps=("frames per second of the synthetic data", "option", "f", int),
+    current_only=("only time the current implementations", "flag", "c"),
+    output=("write the JSON report to this file", "option", "o"))
+def main(hours="1,4,12", fps=8, current_only=False, output=None):
+    """Runs the comparisons and prints a JSON report"""
+    report = {
+        'date': datetime.datetime.utcnow().isoformat(),
+        'host': platform.node(),
+        'machine': platform.machine(),
+        'pandas': pd.__version__,
+        'sessions': []}
+    for length in hours.split(','):
+        print(f"[INFO] comparing on {length} hours of data...")
+        report['sessions'].append(
+            compare(float(length), fps, legacy=not current_only))
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if output is not None:
+        with open(output, 'w') as f:
+            f.write(text + "\n")
+
+
+if __name__ == '__main__':
+    plac.call(main)
@@ -5,102 +5,86 @@ Source: This code was modified from code provided by PyImageSearch.
 USAGE
 >>> python measure_faces.py -p models/deploy.prototxt.txt -m models/res10_300x300_ssd_iter_140000.caffemodel
 
-press 'q' to quit
+Runs headless until Ctrl-C (SIGINT/SIGTERM) or the -t/-n limit. Pass -d to
+show the detections in a debug window and press 'q' in it to quit.
 """
 
 # import the necessary packages
-from imutils.video import VideoStream
-import numpy as np
-import imutils
-import time
 import cv2
 import plac
-from utils.datahandler import DataHandler
+from utils.capture import run_capture
+from utils.pipeline import POLICIES
+from utils.detectors import FaceDetector
+from utils.sessionreader import output_path
 
 
 @plac.annotations(
     prototxt=("path to Caffe 'deploy' prototxt file", "option", "p"),
     model=("path to Caffe pre-trained model", "option", "m"),
     min_confidence=("minimum probability to filter weak detections", "option",
-                    "c"))
-def main(prototxt, model, min_confidence=0.5):
+                    "c", float),
+    display=("show the detections in a debug window", "flag", "d"),
+    duration=("stop after this many seconds", "option", "t", float),
+    max_frames=("stop after this many frames", "option", "n", int),
+    queue_size=("frames queued between capture and inference", "option",
+                "q", int),
+    policy=("what to do when inference falls behind the camera", "option",
+            "o", str, POLICIES),
+    motion=("skip the detectors unless this share of pixels changed",
+            "option", "g", float),
+    max_skip=("frames the detectors may skip in a row without motion",
+              "option", "k", int),
+    backend=("DNN backend; 'auto' times each CPU backend once and caches "
+             "the fastest for this host", "option", "B", str),
+    target=("DNN target: cpu, opencl, opencl_fp16 or myriad", "option", "T",
+            str),
+    threads=("number of threads OpenCV may use", "option", "j", int),
+    input_size=("width and height of the model input", "option", "r", int),
+    commit_delay=("buffer rows and write them at least every this many "
+                  "seconds", "option", "w", float),
+    method=("output format: csv, bin (fixed-width records) or sql "
+            "(SQLite database)", "option", "M", str, ['csv', 'bin', 'sql']),
+    rotate=("start new output files every this many seconds, e.g. 3600",
+            "option", "R", int),
+    max_mb=("start new output files once they hold this many megabytes",
+            "option", "L", float),
+    compress=("gzip the rotated output files once they are closed", "flag",
+              "z"),
+    raw=("record every detection of every frame instead of one row per id "
+         "and second", "flag", "a"),
+    ring=("also publish the records to a shared-memory ring buffer at this "
+          "path, e.g. /dev/shm/measureyes.ring", "option", "s", str),
+    camera=("camera/display ID; the sessions are written to "
+            "../data/output/<camera>", "option", "C", str))
+def main(prototxt, model, min_confidence=0.5, display=False,
+         duration=None, max_frames=None, queue_size=4,
+         policy='drop_oldest', motion=None, max_skip=30,
+         backend='auto', target='cpu', threads=None, input_size=300,
+         commit_delay=None, method='csv', rotate=None,
+         max_mb=None, compress=False, raw=False, ring=None,
+         camera=None):
     """Starts up the webcam and runs object detection on the video feed
     """
+    dnn = {'backend': backend, 'target': target,
+           'input_size': (input_size, input_size)}
+
     # load our serialized model from disk
     print("[INFO] loading model...")
-    net = cv2.dnn.readNetFromCaffe(prototxt, model)
-
-    # initialize the video stream and allow the camera sensor to warmup
-    print("[INFO] starting video stream...")
-    vs = VideoStream(src=0).start()
-    time.sleep(2.0)
-
-    # NN: open a csv file to write data; 'a' to append and not overwrite
-    path_to_data = "../data/output"
-    results = DataHandler(measure="faces", path=path_to_data, method='csv')
-    results.makefile()
-
-    # loop over the frames from the video stream
-    while True:
-        # grab the frame from the threaded video stream and resize it
-        # to have a maximum width of 400 pixels
-        frame = vs.read()
-        frame = imutils.resize(frame, width=400)
-
-        # grab the frame dimensions and convert it to a blob
-        (h, w) = frame.shape[:2]
-        blob = cv2.dnn.blobFromImage(cv2.resize(frame, (300, 300)), 1.0,
-                                     (300, 300), (104.0, 177.0, 123.0))
-
-        # pass the blob through the network and obtain the detections and
-        # predictions
-        net.setInput(blob)
-        detections = net.forward()
-
-        # loop over the detections
-        for i in range(0, detections.shape[2]):
-            # extract the confidence (i.e., probability) associated with the
-            # prediction
-            confidence = detections[0, 0, i, 2]
-
-            # filter out weak detections by ensuring the `confidence` is
-            # greater than the minimum confidence
-            if confidence > min_confidence:
-                # compute the (x, y)-coordinates of the bounding box for the
-                # object
-                box = detections[0, 0, i, 3:7] * np.array([w, h, w, h])
-                (startX, startY, endX, endY) = box.astype("int")
-
-                # draw the bounding box of the face along with the associated
-                # probability
-                text = "{:.2f}%".format(confidence * 100)
-                y = startY - 10 if startY - 10 > 10 else startY + 10
-                cv2.rectangle(frame, (startX, startY), (endX, endY),
-                              (0, 0, 255), 2)
-                cv2.putText(frame, text, (startX, y), cv2.FONT_HERSHEY_SIMPLEX,
-                            0.45, (0, 0, 255), 2)
-
-                # NN: write to output file
-                now = int(time.time())
-                data = "{},face,{},{:.2f},{},{},{},{}".format(
-                    now, i, confidence, startX, startY, endX, endY)
-                results.write(data)
-
-        # show the output frame
-        cv2.imshow("Frame", frame)
-
-        key = cv2.waitKey(1) & 0xFF
+    face_detector = FaceDetector(prototxt, model, min_confidence, **dnn)
 
-        # if the `q` key was pressed, break from the loop
-        if key == ord("q"):
-            break
+    if threads is not None:
+        cv2.setNumThreads(threads)
 
-    # NN: close the results file
-    results.close()
+    max_bytes = None
+    if max_mb is not None:
+        max_bytes = int(max_mb * 1024 * 1024)
 
-    # do a bit of cleanup
-    cv2.destroyAllWindows()
-    vs.stop()
+    run_capture([face_detector], path=output_path(camera),
+                display=display, duration=duration, max_frames=max_frames,
+                queue_size=queue_size, policy=policy, motion=motion,
+                max_skip=max_skip, commit_delay=commit_delay, method=method,
+                rotate=rotate, max_bytes=max_bytes, compress=compress,
+                aggregate=not raw, ring=ring)
 
 
 if __name__ == '__main__':
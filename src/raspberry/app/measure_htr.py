@@ -0,0 +1,119 @@
+"""Run webcam to detect faces and persons on the same frames and log data in
+two csv files
+
+Each frame is captured and resized once and then passed through both the
+res10 face detector and the MobileNetSSD person detector. Both csv files
+share the session start time and every row of a frame has the same ts.
+With -x the face detector only runs on crops around the detected persons.
+
+Source: This code was modified from code provided by PyImageSearch.
+
+USAGE
+>>> python measure_htr.py -fp models/deploy.prototxt.txt -fm models/res10_300x300_ssd_iter_140000.caffemodel -pp models/MobileNetSSD_deploy.prototxt.txt -pm models/MobileNetSSD_deploy.caffemodel
+
+Runs headless until Ctrl-C (SIGINT/SIGTERM) or the -t/-n limit. Pass -d to
+show the detections in a debug window and press 'q' in it to quit.
+"""
+
+# import the necessary packages
+import cv2
+import plac
+from utils.capture import run_capture
+from utils.pipeline import POLICIES
+from utils.detectors import FaceDetector, PersonDetector
+from utils.detectors import CascadeFaceDetector
+from utils.sessionreader import output_path
+
+
+@plac.annotations(
+    face_prototxt=("path to face Caffe 'deploy' prototxt file", "option",
+                   "fp"),
+    face_model=("path to face Caffe pre-trained model", "option", "fm"),
+    person_prototxt=("path to person Caffe 'deploy' prototxt file", "option",
+                     "pp"),
+    person_model=("path to person Caffe pre-trained model", "option", "pm"),
+    min_confidence=("minimum probability to filter weak detections", "option",
+                    "c", float),
+    display=("show the detections in a debug window", "flag", "d"),
+    duration=("stop after this many seconds", "option", "t", float),
+    max_frames=("stop after this many frames", "option", "n", int),
+    queue_size=("frames queued between capture and inference", "option",
+                "q", int),
+    policy=("what to do when inference falls behind the camera", "option",
+            "o", str, POLICIES),
+    motion=("skip the detectors unless this share of pixels changed",
+            "option", "g", float),
+    max_skip=("frames the detectors may skip in a row without motion",
+              "option", "k", int),
+    cascade=("run the face detector only on crops around detected persons",
+             "flag", "x"),
+    backend=("DNN backend; 'auto' times each CPU backend once and caches "
+             "the fastest for this host", "option", "B", str),
+    target=("DNN target: cpu, opencl, opencl_fp16 or myriad", "option", "T",
+            str),
+    threads=("number of threads OpenCV may use", "option", "j", int),
+    input_size=("width and height of the model input", "option", "r", int),
+    commit_delay=("buffer rows and write them at least every this many "
+                  "seconds", "option", "w", float),
+    method=("output format: csv, bin (fixed-width records) or sql "
+            "(SQLite database)", "option", "M", str, ['csv', 'bin', 'sql']),
+    rotate=("start new output files every this many seconds, e.g. 3600",
+            "option", "R", int),
+    max_mb=("start new output files once they hold this many megabytes",
+            "option", "L", float),
+    compress=("gzip the rotated output files once they are closed", "flag",
+              "z"),
+    raw=("record every detection of every frame instead of one row per id "
+         "and second", "flag", "a"),
+    ring=("also publish the records to a shared-memory ring buffer at this "
+          "path, e.g. /dev/shm/measureyes.ring", "option", "s", str),
+    camera=("camera/display ID; the sessions are written to "
+            "../data/output/<camera>", "option", "C", str))
+def main(face_prototxt="models/deploy.prototxt.txt",
+         face_model="models/res10_300x300_ssd_iter_140000.caffemodel",
+         person_prototxt="models/MobileNetSSD_deploy.prototxt.txt",
+         person_model="models/MobileNetSSD_deploy.caffemodel",
+         min_confidence=0.5, display=False,
+         duration=None, max_frames=None, queue_size=4,
+         policy='drop_oldest', motion=None, max_skip=30, cascade=False,
+         backend='auto', target='cpu', threads=None, input_size=300,
+         commit_delay=None, method='csv', rotate=None,
+         max_mb=None, compress=False, raw=False, ring=None,
+         camera=None):
+    """Starts up the webcam and runs face and person detection on the video
+    feed
+    """
+    dnn = {'backend': backend, 'target': target,
+           'input_size': (input_size, input_size)}
+
+    # load our serialized models from disk
+    print("[INFO] loading models...")
+    person_detector = PersonDetector(person_prototxt, person_model,
+                                     min_confidence, **dnn)
+    if cascade:
+        # the cascade needs the person boxes, so persons run first
+        face_detector = CascadeFaceDetector(face_prototxt, face_model,
+                                            min_confidence, **dnn)
+        detectors = [person_detector, face_detector]
+    else:
+        face_detector = FaceDetector(face_prototxt, face_model,
+                                     min_confidence, **dnn)
+        detectors = [face_detector, person_detector]
+
+    if threads is not None:
+        cv2.setNumThreads(threads)
+
+    max_bytes = None
+    if max_mb is not None:
+        max_bytes = int(max_mb * 1024 * 1024)
+
+    run_capture(detectors, path=output_path(camera),
+                display=display, duration=duration, max_frames=max_frames,
+                queue_size=queue_size, policy=policy, motion=motion,
+                max_skip=max_skip, commit_delay=commit_delay, method=method,
+                rotate=rotate, max_bytes=max_bytes, compress=compress,
+                aggregate=not raw, ring=ring)
+
+
+if __name__ == '__main__':
+    plac.call(main)
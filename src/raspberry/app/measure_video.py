@@ -0,0 +1,82 @@
+"""Detect faces and persons in a recorded video file and log data in two csv
+files
+
+The video is split into segments that are measured in parallel, one process
+per core, and the results are merged into one faces and one persons file.
+Timestamps are derived from the frame times of the video.
+
+USAGE
+>>> python measure_video.py ../data/video/store_1539048822.mp4 -S 1539048822
+"""
+
+# import the necessary packages
+import plac
+from utils.detectors import FaceDetector, PersonDetector
+from utils.detectors import CascadeFaceDetector
+from utils.videofile import measure_video
+from utils.sessionreader import output_path
+
+
+@plac.annotations(
+    video=("path to the video file", "positional"),
+    face_prototxt=("path to face Caffe 'deploy' prototxt file", "option",
+                   "fp"),
+    face_model=("path to face Caffe pre-trained model", "option", "fm"),
+    person_prototxt=("path to person Caffe 'deploy' prototxt file", "option",
+                     "pp"),
+    person_model=("path to person Caffe pre-trained model", "option", "pm"),
+    min_confidence=("minimum probability to filter weak detections", "option",
+                    "c", float),
+    start_time=("unix time of the first frame; defaults to the file time "
+                "minus the video length", "option", "S", float),
+    processes=("number of worker processes; defaults to all cores", "option",
+               "j", int),
+    segments=("number of segments; defaults to the number of processes",
+              "option", "s", int),
+    batch_size=("frames stacked into one forward pass", "option", "b", int),
+    max_wait=("seconds a partial batch waits for more frames", "option", "w",
+              float),
+    cascade=("run the face detector only on crops around detected persons",
+             "flag", "x"),
+    backend=("DNN backend: default, opencv, halide or inference_engine",
+             "option", "B", str),
+    target=("DNN target: cpu, opencl, opencl_fp16 or myriad", "option", "T",
+            str),
+    input_size=("width and height of the model input", "option", "r", int),
+    camera=("camera/display ID; the sessions are written to "
+            "../data/output/<camera>", "option", "C", str))
+def main(video,
+         face_prototxt="models/deploy.prototxt.txt",
+         face_model="models/res10_300x300_ssd_iter_140000.caffemodel",
+         person_prototxt="models/MobileNetSSD_deploy.prototxt.txt",
+         person_model="models/MobileNetSSD_deploy.caffemodel",
+         min_confidence=0.5, start_time=None, processes=None, segments=None,
+         batch_size=8, max_wait=0.05, cascade=False, backend='default',
+         target='cpu', input_size=300, camera=None):
+    """Runs face and person detection on a video file"""
+    # every worker loads its own copy of the models with these arguments
+    dnn = (backend, target, (input_size, input_size))
+    if cascade:
+        # the cascade needs the person boxes, so persons run first
+        detectors = [
+            (PersonDetector, person_prototxt, person_model, min_confidence,
+             *dnn),
+            (CascadeFaceDetector, face_prototxt, face_model, min_confidence,
+             *dnn)]
+    else:
+        detectors = [
+            (FaceDetector, face_prototxt, face_model, min_confidence, *dnn),
+            (PersonDetector, person_prototxt, person_model, min_confidence,
+             *dnn)]
+
+    print("[INFO] measuring video...")
+    merged = measure_video(video, detectors, path=output_path(camera),
+                           start_time=start_time, processes=processes,
+                           segments=segments, batch_size=batch_size,
+                           max_wait=max_wait)
+    for csvfilename in merged:
+        print(f"[INFO] results written to {csvfilename}")
+
+
+if __name__ == '__main__':
+    plac.call(main)
@@ -0,0 +1,88 @@
+"""Render the standard report plots of many sessions without a display
+
+Finds the sessions of a directory or glob (see utils/sessionreader.py),
+reads each one and renders the report set below to PNG or SVG files in one
+process, plus a report.csv with the average HTR of every session.
+
+USAGE
+>>> python render_report.py ../data/output
+>>> python render_report.py "../data/output/door/faces_*.csv" -f svg -o ../data/report
+"""
+
+# import the necessary packages
+import csv
+import os
+import plac
+from utils.datareader import DataReader, CHUNKSIZE
+from utils.sessionreader import find_sessions
+
+# name, kind, metric and bin of every plot of a session
+REPORTS = [
+    ('faces', 'line', 'face', None),
+    ('persons', 'line', 'person', None),
+    ('htr_15min', 'bar', None, '15Min'),
+    ('htr_1h', 'stackarea', None, '1H')]
+
+
+def read_from(filename):
+    """Returns the DataReader read_from of a session file"""
+    if filename.endswith('.manifest.json'):
+        return 'manifest'
+    if filename.endswith('.bin'):
+        return 'bin'
+    return 'csv'
+
+
+def render_session(session, path, fmt='png', dpi=100):
+    """Renders the REPORTS of one session and returns the file names and
+    the average HTR
+
+    Arguments:
+        session (dict): a session of find_sessions
+        path (str): directory for the files
+        fmt (str): 'png' or 'svg'
+    """
+    method = read_from(session['faces'])
+    reader = DataReader(session['faces'], session['persons'],
+                        read_from=method,
+                        chunksize=CHUNKSIZE if method == 'csv' else None)
+    prefix = os.path.join(path, f"{session['camera']}_{session['session']}")
+    filenames = [reader.export(f"{prefix}_{name}.{fmt}", kind=kind,
+                               metric=metric, bin_time_by=bin_time_by,
+                               dpi=dpi)
+                 for (name, kind, metric, bin_time_by) in REPORTS]
+    return filenames, reader.avg_htr
+
+
+@plac.annotations(
+    source=("directory, glob or session file to report on", "positional"),
+    output=("directory for the report files", "option", "o"),
+    fmt=("image format", "option", "f", str, ['png', 'svg']),
+    camera=("only report on the sessions of this camera", "option", "C",
+            str),
+    dpi=("dots per inch of the png files", "option", "d", int))
+def main(source="../data/output", output="../data/report", fmt='png',
+         camera=None, dpi=100):
+    """Renders the report set of every session"""
+    os.makedirs(output, exist_ok=True)
+    sessions = find_sessions(source, camera)
+    print(f"[INFO] rendering {len(sessions)} sessions...")
+
+    rows = []
+    for session in sessions:
+        filenames, avg_htr = render_session(session, output, fmt, dpi)
+        print(f"[INFO] {session['camera']} {session['session']}: "
+              f"avg HTR {avg_htr:.3f}")
+        rows.append([session['camera'], session['session'], avg_htr]
+                    + [os.path.basename(f) for f in filenames])
+
+    with open(os.path.join(output, 'report.csv'), 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['camera', 'session', 'avg_htr']
+                        + [name for (name, *_) in REPORTS])
+        writer.writerows(rows)
+    return rows
+
+
+if __name__ == '__main__':
+    plac.call(main)
@@ -1,32 +1,126 @@
 import plac
 import time
 import datetime
+import numpy as np
+import pandas as pd
 from utils.datastreamer import DataStreamer
-from utils.datareader import DataReader
+from utils.datareader import records_to_frame
+from utils.ringbuffer import RingReader
+from utils.rollup import RollupStore
+from utils.tailreader import TailReader
 
 
 def convert_ts_timeofday(ts):
     return datetime.datetime.utcfromtimestamp(ts).strftime('%H:%M:%S')
 
 
+def count_htr(df):
+    """Returns the faces and persons per second of a records DataFrame"""
+    counts = df.groupby(['ts', 'label'], observed=True)['id'].nunique()
+    counts = counts.unstack(fill_value=0).reindex(
+        columns=['face', 'person'], fill_value=0)
+    ts = np.arange(counts.index.min(), counts.index.max() + 1)
+    counts = counts.reindex(ts, fill_value=0)
+    htr_df = pd.DataFrame(data={
+        'ts': ts,
+        'faces': counts['face'].values,
+        'persons': counts['person'].values})
+    htr_df['faces'] = htr_df['faces'].clip(upper=htr_df['persons'])
+    return htr_df
+
+
+def stream_ring(dashboard, ring):
+    """Posts the faces and persons per second read from the ring buffer"""
+    reader = RingReader(ring)
+    pending = records_to_frame(reader.read())
+
+    while True:
+        time.sleep(30)
+        df = pd.concat([pending, records_to_frame(reader.read())],
+                       ignore_index=True)
+        df = df[df['label'].isin(['face', 'person'])]
+        if reader.lost:
+            print(f"[INFO] {reader.lost} records were lost to overruns")
+        if df.shape[0] == 0:
+            pending = df
+            continue
+
+        # the last second may still get records
+        last = df['ts'].max()
+        pending = df[df['ts'] == last]
+        complete = df[df['ts'] < last]
+        if complete.shape[0] == 0:
+            continue
+
+        new_data = count_htr(complete)
+        print(new_data.shape)
+        new_data['ts'] = new_data['ts'].apply(convert_ts_timeofday)
+        data = {'processed_data': new_data.to_dict(orient="records")}
+        if dashboard.post(data) is not True:
+            # try again with the next batch
+            pending = df
+
+
+def stream_rollup(dashboard, results, store, bin_seconds, last_run):
+    """Adds the seconds of a TailReader to a RollupStore and posts the bins
+    that can no longer change"""
+    # seconds from `changed` on may still get rows
+    changed = None
+    while True:
+        results.update()
+        if results.first_ts is not None:
+            store.add(results.get_htr_data("unix", start=changed))
+            changed = max(results.first_ts, results.last_ts - results.window)
+
+            # a bin is complete once all of its seconds are out of the window
+            bins = store.binned(bin_seconds, start=last_run + 1)
+            new_data = bins[(bins['ts'] > last_run)
+                            & (bins['ts'] + bin_seconds <= changed)].copy()
+            print(new_data.shape)
+            if new_data.shape[0] > 0:
+                last_ts = int(new_data['ts'].max())
+                new_data['ts'] = new_data['ts'].apply(convert_ts_timeofday)
+                data = {'processed_data': new_data.to_dict(orient="records")}
+                if dashboard.post(data) is True:
+                    last_run = last_ts
+        time.sleep(30)
+
+
 @plac.annotations(
     face_data=("Path to face data.", "positional"),
     person_data=("Path to person data.", "positional"),
-    api_url=("Dashboard URL", "option", "a", str))
-def main(face_data, person_data, api_url=None):
+    api_url=("Dashboard URL", "option", "a", str),
+    ring=("read the records from this shared-memory ring buffer instead of "
+          "the csv files", "option", "r", str),
+    rollup=("keep the faces and persons in this rollup file and post them "
+            "from it", "option", "u", str),
+    bin_seconds=("with -u, post the sums of bins of this many seconds",
+                 "option", "b", int))
+def main(face_data=None, person_data=None, api_url=None, ring=None,
+         rollup=None, bin_seconds=1):
     if api_url is None:
         api_url = "https://hidden-lowlands-41791.herokuapp.com/responses/1"
 
-    last_run = int(datetime.date.today().strftime("%s"))  # midnight today
-    print(last_run)
-
     dashboard = DataStreamer(
         api_url=api_url,
         face_data=face_data,
         person_data=person_data)
 
+    if ring is not None:
+        stream_ring(dashboard, ring)
+        return
+
+    last_run = int(datetime.date.today().strftime("%s"))  # midnight today
+    print(last_run)
+
+    # only the lines appended since the last poll are parsed
+    results = TailReader(face_data=face_data, person_data=person_data)
+    if rollup is not None:
+        stream_rollup(dashboard, results, RollupStore(rollup), bin_seconds,
+                      last_run)
+        return
     while True:
-        results = DataReader(face_data=face_data, person_data=person_data)
+        results.update()
         htr_data = results.get_htr_data(time_format="unix")
 
         # subset only data after last_run time
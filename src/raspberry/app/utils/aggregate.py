@@ -0,0 +1,114 @@
+"""Per-second aggregation of the detections before they are recorded.
+
+At ~8 FPS every detection is written once per frame, although
+`DataReader.process_data` collapses the rows to one per (ts, id) anyway. The
+SecondAggregator sits in front of a DataHandler, collects the detections of
+the current second and writes one row per id with the mean confidence and
+mean box once the second is over. The output has the usual row format, so it
+is read like per-frame data, with a fraction of the rows. The per-frame
+detail is kept in the count columns of each row: the frames the id was seen
+in (`seen`), the frames of the second (`frames`) and the most detections in
+one of them (`max_simultaneous`). A second without any detection has no row.
+"""
+import numpy as np
+
+from .postprocess import DETECTION_DTYPE, BOX_FIELDS
+
+
+def aggregate(detections):
+    """Returns the mean detection of every id and how many frames saw it
+
+    Arguments:
+        detections (ndarray): DETECTION_DTYPE records of one second
+
+    Returns:
+        (DETECTION_DTYPE records sorted by id, counts)
+    """
+    ids, inverse, counts = np.unique(detections['id'], return_inverse=True,
+                                     return_counts=True)
+    means = np.empty(len(ids), dtype=DETECTION_DTYPE)
+    means['id'] = ids
+    # the class of an id is the one of its first detection
+    means['class_id'] = detections['class_id'][
+        np.unique(inverse, return_index=True)[1]]
+    means['confidence'] = np.bincount(
+        inverse, weights=detections['confidence']) / counts
+    for field in BOX_FIELDS:
+        means[field] = np.rint(np.bincount(
+            inverse, weights=detections[field]) / counts)
+    return means, counts
+
+
+class SecondAggregator():
+    def __init__(self, handler):
+        """Writes one row per id and second to a DataHandler.
+
+        It takes the place of the handler in the Pipeline: it has the same
+        `write_detections`, `flush` and `close` methods.
+
+        Arguments:
+            handler (DataHandler): receives the per-second rows
+
+        Attributes:
+            rows_in (int): detections received
+            rows_out (int): rows written
+            frames (int): frames of the last written second
+            max_simultaneous (int): most detections in one frame of the last
+                written second
+        """
+        self.handler = handler
+        self.measure = handler.measure
+        self.ts = None
+        self.labels = None
+        self.frame = 0
+        self.ns = 0
+        self.pending = []
+        self.pending_frames = 0
+        self.pending_max = 0
+        self.rows_in = 0
+        self.rows_out = 0
+        self.frames = 0
+        self.max_simultaneous = 0
+
+    def write_detections(self, ts, detections, labels, frame=0, ns=0):
+        """Adds the detections of one frame to the accumulators of its
+        second; the previous second is written once a new one starts
+
+        The rows of a second carry the frame and ns of its first frame.
+        """
+        if ts != self.ts:
+            self.emit()
+            self.ts = ts
+            self.labels = labels
+            self.frame = frame
+            self.ns = ns
+        self.pending_frames += 1
+        self.pending_max = max(self.pending_max, len(detections))
+        if len(detections):
+            self.pending.append(detections)
+            self.rows_in += len(detections)
+
+    def emit(self):
+        """Writes the rows of the second that is being collected"""
+        if self.ts is None:
+            return
+        if self.pending:
+            means, counts = aggregate(np.concatenate(self.pending))
+            self.handler.write_detections(
+                self.ts, means, self.labels, frame=self.frame, ns=self.ns,
+                seen=counts, frames=self.pending_frames,
+                max_simultaneous=self.pending_max)
+            self.rows_out += len(means)
+        self.frames = self.pending_frames
+        self.max_simultaneous = self.pending_max
+        self.pending = []
+        self.pending_frames = 0
+        self.pending_max = 0
+
+    def flush(self):
+        self.handler.flush()
+
+    def close(self, end_time=None):
+        """Writes the last second and closes the handler"""
+        self.emit()
+        self.handler.close(end_time=end_time)
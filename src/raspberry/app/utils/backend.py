@@ -0,0 +1,188 @@
+"""Functions to choose the OpenCV DNN backend, target and thread count.
+
+With backend 'auto' a few warm-up forward passes are timed for every CPU
+backend and thread count that works on this build of OpenCV, and the fastest
+choice is used. The choice is saved in a per-host cache file so later starts
+skip the calibration.
+
+`cv2.setNumThreads` applies to the whole process, so the thread count is
+cached once per host: the first model calibrated picks it and every later
+model only picks its backend at that thread count.
+"""
+import json
+import os
+import socket
+import time
+import numpy as np
+import cv2
+
+# only the constants that exist in the installed OpenCV are offered
+BACKENDS = {name: getattr(cv2.dnn, const) for (name, const) in [
+    ('default', 'DNN_BACKEND_DEFAULT'),
+    ('opencv', 'DNN_BACKEND_OPENCV'),
+    ('halide', 'DNN_BACKEND_HALIDE'),
+    ('inference_engine', 'DNN_BACKEND_INFERENCE_ENGINE')]
+    if hasattr(cv2.dnn, const)}
+
+TARGETS = {name: getattr(cv2.dnn, const) for (name, const) in [
+    ('cpu', 'DNN_TARGET_CPU'),
+    ('opencl', 'DNN_TARGET_OPENCL'),
+    ('opencl_fp16', 'DNN_TARGET_OPENCL_FP16'),
+    ('myriad', 'DNN_TARGET_MYRIAD')]
+    if hasattr(cv2.dnn, const)}
+
+CACHE_PATH = "../data/cache"
+
+
+def configure(net, backend='default', target='cpu'):
+    """Sets the preferable backend and target of a net"""
+    assert backend in BACKENDS, f"backend must be one of {list(BACKENDS)}"
+    assert target in TARGETS, f"target must be one of {list(TARGETS)}"
+    net.setPreferableBackend(BACKENDS[backend])
+    net.setPreferableTarget(TARGETS[target])
+
+
+def add_arguments(ap, input_size=300):
+    """Adds the -b/-t/-j/-r DNN options to an argparse parser, for the
+    scripts outside the app"""
+    ap.add_argument("-b", "--backend", default="default",
+                    choices=list(BACKENDS), help="DNN backend")
+    ap.add_argument("-t", "--target", default="cpu", choices=list(TARGETS),
+                    help="DNN target")
+    ap.add_argument("-j", "--threads", type=int, default=None,
+                    help="number of threads OpenCV may use")
+    ap.add_argument("-r", "--input-size", type=int, default=input_size,
+                    help="width and height of the model input in pixels")
+
+
+def apply_arguments(net, args):
+    """Configures a net with the options of add_arguments and returns the
+    (width, height) of its input
+
+    Arguments:
+        net: cv2.dnn net to configure
+        args (dict): the parsed arguments, as vars(ap.parse_args())
+    """
+    configure(net, args["backend"], args["target"])
+    if args["threads"] is not None:
+        cv2.setNumThreads(args["threads"])
+    return (args["input_size"], args["input_size"])
+
+
+def time_forward(net, blob, warmup=2, runs=5):
+    """Returns the median seconds of a forward pass after warming up"""
+    net.setInput(blob)
+    for i in range(warmup):
+        net.forward()
+
+    timings = []
+    for i in range(runs):
+        start = time.perf_counter()
+        net.setInput(blob)
+        net.forward()
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings))
+
+
+def thread_options():
+    """Returns the thread counts worth trying on this device"""
+    cores = os.cpu_count() or 1
+    return sorted(set([1, max(1, cores // 2), cores]))
+
+
+def calibrate(net, input_size, threads=None, warmup=2, runs=5):
+    """Times every CPU backend and thread count and returns the fastest
+
+    Arguments:
+        net: cv2.dnn net to calibrate
+        input_size (tuple): (width, height) of the input blob
+        threads (int): only time this thread count
+
+    Returns:
+        dict of backend, target, threads and ms
+    """
+    (w, h) = input_size
+    blob = np.random.uniform(0, 1, size=(1, 3, h, w)).astype(np.float32)
+
+    choices = []
+    options = thread_options() if threads is None else [threads]
+    for backend in BACKENDS:
+        for n_threads in options:
+            try:
+                configure(net, backend, 'cpu')
+                cv2.setNumThreads(n_threads)
+                seconds = time_forward(net, blob, warmup, runs)
+            except cv2.error:
+                # the backend is not available in this build
+                continue
+            choices.append({'backend': backend, 'target': 'cpu',
+                            'threads': n_threads, 'ms': seconds * 1000})
+            print("[INFO] backend {} with {} threads: {:.1f} ms".format(
+                backend, n_threads, seconds * 1000))
+
+    assert choices, "no DNN backend could run the model"
+    return min(choices, key=lambda choice: choice['ms'])
+
+
+def cache_filename(cache_dir=CACHE_PATH):
+    """Returns the calibration cache file of this host"""
+    return os.path.join(cache_dir, f"dnn_backend_{socket.gethostname()}.json")
+
+
+def cache_key(model, input_size):
+    """Returns the key of a model in the calibration cache"""
+    (w, h) = input_size
+    return f"{os.path.basename(model)}:{w}x{h}:opencv-{cv2.__version__}"
+
+
+def threads_key():
+    """Returns the key of the thread count of this host in the cache"""
+    return f"threads:opencv-{cv2.__version__}"
+
+
+def load_cache(filename):
+    if not os.path.exists(filename):
+        return {}
+    with open(filename) as f:
+        return json.load(f)
+
+
+def save_cache(filename, cache):
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    with open(filename, 'w') as f:
+        json.dump(cache, f, indent=2, sort_keys=True)
+
+
+def select_backend(net, model, input_size, cache_dir=CACHE_PATH):
+    """Applies the fastest backend for a model and the thread count of the
+    host, calibrating if needed
+
+    Arguments:
+        net: cv2.dnn net to configure
+        model (str): path to the model; identifies it in the cache
+        input_size (tuple): (width, height) of the input blob
+        cache_dir (str): directory of the per-host cache file
+
+    Returns:
+        dict of backend, target, threads and ms
+    """
+    filename = cache_filename(cache_dir)
+    key = cache_key(model, input_size)
+    cache = load_cache(filename)
+
+    threads = cache.get(threads_key())
+    choice = cache.get(key)
+    if (choice is None or choice['backend'] not in BACKENDS
+            or choice['threads'] != threads):
+        print("[INFO] calibrating the DNN backend...")
+        # the first model picks the thread count of the process
+        choice = calibrate(net, input_size, threads)
+        cache[key] = choice
+        cache[threads_key()] = choice['threads']
+        save_cache(filename, cache)
+
+    configure(net, choice['backend'], choice['target'])
+    cv2.setNumThreads(choice['threads'])
+    print("[INFO] using backend {}, target {}, {} threads".format(
+        choice['backend'], choice['target'], choice['threads']))
+    return choice
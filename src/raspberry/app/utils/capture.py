@@ -0,0 +1,133 @@
+"""Capture loop shared by the measure apps.
+
+Each frame is read from the camera once, resized once and then handed to
+every detector, so the face and person outputs share the frame timestamp.
+Capture, inference and writing run as the stages of a Pipeline.
+"""
+import time
+import cv2
+
+from .aggregate import SecondAggregator
+from .clock import FrameClock
+from .datahandler import DataHandler
+from .motion import MotionGate
+from .overlay import Overlay
+from .pipeline import Pipeline
+from .ringbuffer import RingBuffer
+from .runcontrol import RunControl
+
+
+def run_capture(detectors, path="../data/output", src=0, display=False,
+                duration=None, max_frames=None, overlay_fps=5, queue_size=4,
+                policy='drop_oldest', batch_size=1, max_wait=0.05,
+                motion=None, max_skip=30, commit_delay=None, method='csv',
+                rotate=None, max_bytes=None, compress=False, aggregate=False,
+                ring=None):
+    """Starts up the webcam and runs the detectors on the video feed
+
+    By default the loop is headless: nothing is drawn and no window is
+    opened. It stops on SIGINT/SIGTERM or when `duration` or `max_frames` is
+    reached, and always closes the output files with a videoend row.
+
+    Arguments:
+        detectors (list): Detector objects to run on every frame
+        path (str): path to directory for data
+        src (int): index of the camera
+        display (bool): show the detections in a debug window; press 'q' in
+            the window to quit
+        duration (float): seconds to run for; None runs until stopped
+        max_frames (int): frames to process; None runs until stopped
+        overlay_fps (float): refresh rate of the debug window
+        queue_size (int): frames queued between capture and inference
+        policy (str): 'drop_oldest', 'drop_newest' or 'block' when inference
+            falls behind the camera
+        batch_size (int): frames stacked into one forward pass
+        max_wait (float): seconds a partial batch waits for more frames
+        motion (float): share of changed pixels that counts as motion; None
+            runs the detectors on every frame
+        max_skip (int): frames the detectors may skip in a row without motion
+        commit_delay (float): buffer the rows and commit them in groups at
+            least every `commit_delay` seconds; None flushes every frame
+        method (str): 'csv' for text rows, 'bin' for fixed-width records or
+            'sql' for the SQLite database
+        rotate (int): start new csv/bin segment files every this many seconds
+        max_bytes (int): start new segment files at this size
+        compress (bool): gzip the segment files once they are closed
+        aggregate (bool): record one row per id and second with the mean
+            confidence and box instead of every detection of every frame
+        ring (str): also publish the records to a shared-memory ring buffer
+            at this path, e.g. /dev/shm/measureyes.ring
+
+    Returns:
+        dict of the pipeline stats
+    """
+    control = RunControl(duration=duration, max_frames=max_frames)
+
+    # initialize the video stream and allow the camera sensor to warmup
+    print("[INFO] starting video stream...")
+    vs = cv2.VideoCapture(src)
+    time.sleep(2.0)
+
+    # NN: open one file per detector; the files share the session start
+    clock = FrameClock()
+    start_time = clock.start_time
+    if ring is not None:
+        ring = RingBuffer(ring)
+    handlers = []
+    for detector in detectors:
+        results = DataHandler(measure=detector.measure, path=path,
+                              method=method, start_time=start_time,
+                              anchor_ns=clock.anchor_ns,
+                              buffered=commit_delay is not None,
+                              max_delay=commit_delay, rotate=rotate,
+                              max_bytes=max_bytes, compress=compress,
+                              ring=ring)
+        results.makefile()
+        if aggregate:
+            results = SecondAggregator(results)
+        handlers.append(results)
+
+    overlay = None
+    if display:
+        overlay = Overlay(detectors, fps=overlay_fps)
+        overlay.start()
+
+    gate = None
+    if motion is not None:
+        gate = MotionGate(sensitivity=motion, max_skip=max_skip)
+
+    pipeline = Pipeline(vs, detectors, handlers, control, overlay=overlay,
+                        queue_size=queue_size, policy=policy, clock=clock,
+                        batch_size=batch_size, max_wait=max_wait, gate=gate)
+    control.start()
+
+    try:
+        pipeline.run()
+    finally:
+        # display FPS and queue information
+        stats = pipeline.stats()
+        print("[INFO] elapsed time: {:.2f}".format(stats['elapsed']))
+        print("[INFO] approx. FPS: {:.2f}".format(stats['fps']))
+        print("[INFO] capture FPS: {:.2f}".format(stats['capture_fps']))
+        print("[INFO] frames captured: {}, processed: {}, dropped: {}".format(
+            stats['captured'], stats['processed'], stats['dropped']))
+        print("[INFO] frames gated by the motion gate: {}".format(
+            stats['gated']))
+        print("[INFO] max queue depth: frames {}, results {}".format(
+            stats['frame_queue_max_depth'], stats['result_queue_max_depth']))
+
+        # NN: close the outfiles
+        for results in handlers:
+            results.close()
+        if ring is not None:
+            ring.close()
+        if aggregate:
+            for results in handlers:
+                print("[INFO] {} rows aggregated into {}".format(
+                    results.rows_in, results.rows_out))
+
+        # do a bit of cleanup
+        if overlay is not None:
+            overlay.stop()
+        vs.release()
+    return stats
@@ -0,0 +1,33 @@
+"""Monotonic frame clock anchored once to the wall clock.
+
+Frames are stamped with `time.monotonic_ns()` when they are captured, so NTP
+steps on the Pi can no longer reorder them. The wall clock is read once, at
+the start of the session, and recorded as the anchor in the `videostart` row:
+its `ts` is the session start in unix seconds and its `ns` is the monotonic
+time at which the wall clock read exactly that second. The unix time of any
+frame is then
+
+    ts_videostart + (ns - ns_videostart) / 1e9
+"""
+import time
+
+NS = 10 ** 9
+
+
+class FrameClock():
+    def __init__(self):
+        """Reads the wall clock and the monotonic clock together once
+
+        Attributes:
+            start_time (int): unix second the session starts in
+            anchor_ns (int): monotonic ns at which the wall clock read
+                `start_time`
+        """
+        wall_ns = time.time_ns()
+        mono_ns = time.monotonic_ns()
+        self.start_time = wall_ns // NS
+        self.anchor_ns = mono_ns - wall_ns % NS
+
+    def __call__(self, ns):
+        """Returns the unix second of a monotonic ns stamp"""
+        return self.start_time + (ns - self.anchor_ns) // NS
@@ -1,34 +1,225 @@
 """Class object that handles recording of data either to csv or SQL.
+
+The 'bin' method writes fixed-width little-endian records (RECORD_DTYPE)
+back to back, without any text formatting. A file can be opened with
+`read_records`, which memory maps it as a NumPy structured array.
+
+The 'sql' method inserts the rows into a SQLite database in the data
+directory, shared by faces and persons, see sqlstore.
+
+With `rotate` or `max_bytes` the csv and bin files are rotated into
+segments listed in a manifest, see segments.
+
+Every row carries the sequence number of its frame and the monotonic ns time
+the frame was captured at. The `ns` of the videostart row is the wall-clock
+anchor of the session, see clock.
+
+Every row also says how many frames it stands for: `seen` is the number of
+frames its id was seen in, `frames` the number of frames and
+`max_simultaneous` the most detections in one of them. A per-frame row has
+1, 1 and the detections of its frame; a per-second row of the
+SecondAggregator has the counts of its second.
 """
+import atexit
+import gzip
+import os
+import threading
 import time
+import numpy as np
+
+from .clock import FrameClock, NS
+from .postprocess import pad_row, to_csv
+from . import segments
+from . import sqlstore
+
+CSV_HEADER = ("ts,label,id,confidence,startX,startY,endX,endY,frame,ns,"
+              "seen,frames,max_simultaneous\n")
+
+# one record per detection; the label is stored as its index in LABELS
+RECORD_DTYPE = np.dtype([
+    ('ts', '<i8'),
+    ('label', 'u1'),
+    ('id', '<i2'),
+    ('confidence', '<f4'),
+    ('startX', '<i2'),
+    ('startY', '<i2'),
+    ('endX', '<i2'),
+    ('endY', '<i2'),
+    ('frame', '<i4'),
+    ('ns', '<i8'),
+    ('seen', '<i2'),
+    ('frames', '<i2'),
+    ('max_simultaneous', '<i2')])
+
+LABELS = ['videostart', 'videoend', 'face', 'person']
+LABEL_CODES = {label: code for code, label in enumerate(LABELS)}
+
+EXTENSIONS = {'csv': 'csv', 'bin': 'bin'}
+
+
+def to_records(ts, detections, labels, frame=0, ns=0, seen=1, frames=1,
+               max_simultaneous=None):
+    """Returns the detections of one frame as RECORD_DTYPE records
+
+    Arguments:
+        ts (int): timestamp of the frame
+        detections (ndarray): postprocess.DETECTION_DTYPE records
+        labels (list): label of each class id
+        frame (int): sequence number of the frame
+        ns (int): monotonic capture time of the frame in ns
+        seen (int or array): frames each detection was seen in
+        frames (int): frames the records stand for
+        max_simultaneous (int): most detections in one of those frames;
+            defaults to the number of detections
+    """
+    if max_simultaneous is None:
+        max_simultaneous = len(detections)
+    codes = np.array([LABEL_CODES.get(label, 255) for label in labels],
+                     dtype=np.uint8)
+    records = np.empty(len(detections), dtype=RECORD_DTYPE)
+    records['ts'] = ts
+    records['label'] = codes[detections['class_id']]
+    for field in ['id', 'confidence', 'startX', 'startY', 'endX', 'endY']:
+        records[field] = detections[field]
+    records['frame'] = frame
+    records['ns'] = ns
+    records['seen'] = seen
+    records['frames'] = frames
+    records['max_simultaneous'] = max_simultaneous
+    return records
+
+
+def marker_record(ts, label, ns=0):
+    """Returns the videostart or videoend record"""
+    record = np.zeros(1, dtype=RECORD_DTYPE)
+    record['ts'] = ts
+    record['label'] = LABEL_CODES[label]
+    record['ns'] = ns
+    return record
+
+
+def read_records(filename):
+    """Memory maps a file written with the 'bin' method
+
+    Returns:
+        read-only structured ndarray of RECORD_DTYPE; the columns are views
+        into the file and nothing is parsed or copied. A compressed segment
+        (.gz) is decompressed into memory instead
+    """
+    if filename.endswith('.gz'):
+        with gzip.open(filename, 'rb') as f:
+            return np.frombuffer(f.read(), dtype=RECORD_DTYPE)
+    return np.memmap(filename, dtype=RECORD_DTYPE, mode='r')
 
 
 class DataHandler():
-    def __init__(self, measure, path, method='csv'):
+    def __init__(self, measure, path, method='csv', start_time=None,
+                 anchor_ns=None,
+                 buffered=False, max_rows=500, max_delay=1.0, rotate=None,
+                 max_bytes=None, compress=False, ring=None):
         """Records the results from the object detection video feed.
 
         Arguments:
             measure (str): 'faces' or 'persons'
             path (str): path to directory for data
-            method (str): 'csv' or 'sql'
-
-        Note: sql method is not supported yet
+            method (str): 'csv', 'bin' or 'sql'; sql records into
+                `{path}/measureyes.db`
+            start_time (int): session start; defaults to now. Pass the same
+                value to the faces and persons handlers to pair their files
+            anchor_ns (int): monotonic ns at which the wall clock read
+                `start_time`, written in the videostart row; see
+                clock.FrameClock. Defaults to now with `start_time`, and to
+                0 (unknown) without
+            buffered (bool): collect rows in memory and commit them in groups
+                on a background thread instead of one flushed write per call
+            max_rows (int): buffered rows that trigger a commit
+            max_delay (float): seconds after which buffered rows are
+                committed at the latest; the durability window
+            rotate (int): start a new segment file every `rotate` seconds,
+                aligned to the clock, e.g. 3600 for hourly files
+            max_bytes (int): start a new segment file once the current one
+                holds this many bytes
+            compress (bool): gzip every segment once it is closed
+            ring (RingBuffer): also publish the records to this ring buffer
+                for local consumers; faces and persons can share one
         """
         assert measure in ['faces', 'persons']
-        assert method in ['csv', 'sql']
+        assert method in ['csv', 'bin', 'sql']
         self.method = method
-        self.start_time = int(time.time())
-        self.csvfilename = f'{path}/{measure}_{self.start_time}.csv'
-        self.csvfile = None
-
-    def makefile(self):
-        """Creates a csv file to record the results"""
-        self.csvfile = open(self.csvfilename, 'a')
-        header = "ts,label,id,confidence,startX,startY,endX,endY\n"
-        self.csvfile.write(header)
-        self.csvfile.write("{},{},0,0,0,0,0,0\n".format(
-            self.start_time, 'videostart'))
+        if start_time is None:
+            clock = FrameClock()
+            (start_time, anchor_ns) = (clock.start_time, clock.anchor_ns)
+        self.start_time = start_time
+        self.anchor_ns = anchor_ns or 0
+        self.measure = measure
+        self.path = path
+
+        self.rotating = bool(rotate or max_bytes)
+        assert not (self.rotating and method == 'sql'), \
+            "the sql method is not rotated"
+        self.rotate = rotate
+        self.max_bytes = max_bytes
+        self.compress = compress
+        self.manifest = None
+        self.manifest_file = None
+        self._segment_end = None
+        self._segment_bytes = 0
+        self._segment_rows = 0
+        self._last_ts = start_time
+        self._compressors = []
+        self._manifest_lock = threading.Lock()
 
+        if method == 'sql':
+            self.filename = f'{path}/{sqlstore.DB_NAME}'
+        elif self.rotating:
+            self.manifest_file = segments.manifest_filename(
+                path, measure, start_time)
+            self.filename = None
+        else:
+            self.filename = \
+                f'{path}/{measure}_{self.start_time}.{EXTENSIONS[method]}'
+        self.csvfilename = self.filename
+        self.outfile = None
+        self.ring = ring
+
+        self.buffered = buffered
+        self.max_rows = max_rows
+        self.max_delay = max_delay
+        self._buffer = []
+        self._pending = 0
+        self._closing = False
+        self._committer = None
+        # _cond guards the buffer, _io_lock keeps the commits in order
+        self._cond = threading.Condition()
+        self._io_lock = threading.Lock()
+
+    def makefile(self, verbose=True):
+        """Creates a csv or bin file, or opens the database, to record the
+        results"""
+        if self.rotating:
+            self.manifest = {'measure': self.measure,
+                             'session': self.start_time,
+                             'method': self.method,
+                             'segments': []}
+            self._start_segment(self.start_time)
+        else:
+            self._open()
+        self.outfile.write(
+            self._marker(self.start_time, 'videostart', self.anchor_ns))
+        self.outfile.flush()
+        if self.ring is not None:
+            self.ring.write(marker_record(self.start_time, 'videostart',
+                                          self.anchor_ns))
+
+        if self.buffered:
+            self._committer = threading.Thread(
+                target=self._commit_loop, name='datahandler', daemon=True)
+            self._committer.start()
+            # never lose buffered rows, even if close() is not reached
+            atexit.register(self.flush)
+
+        if not verbose:
+            return
         print("Object detection results are being recorded")
         print("""Run the following command in a new terminal to stream the
               output data to the dashboard:""")
@@ -37,15 +228,240 @@ class DataHandler():
 ../data/output/persons_{self.start_time}.csv -a \
 "https://hidden-lowlands-41791.herokuapp.com/responses/1"''')
 
+    def _open(self):
+        """Opens `filename` and writes the csv header"""
+        if self.method == 'sql':
+            self.outfile = sqlstore.SQLiteWriter(
+                self.filename, self.start_time, self.measure)
+        elif self.method == 'bin':
+            self.outfile = open(self.filename, 'ab')
+        else:
+            self.outfile = open(self.filename, 'a')
+            self.outfile.write(CSV_HEADER)
+
+    def _marker(self, ts, label, ns):
+        """Returns the videostart or videoend row in the format of the method
+        """
+        if self.method == 'sql':
+            return [(ts, label, 0, 0, 0, 0, 0, 0, 0, ns, 0, 0, 0)]
+        if self.method == 'bin':
+            return marker_record(ts, label, ns).tobytes()
+        return "{},{},0,0,0,0,0,0,0,{},0,0,0\n".format(ts, label, ns)
+
+    def _start_segment(self, ts):
+        """Opens the segment that starts at ts and adds it to the manifest"""
+        if self.rotate and (self._segment_end is None
+                            or ts >= self._segment_end):
+            # segments of a new period start on the clock boundary
+            ts = max(ts - ts % self.rotate, self.start_time)
+            self._segment_end = ts - ts % self.rotate + self.rotate
+        # a segment started by max_bytes may start in the same second as the
+        # previous one and must not reopen its file
+        part = sum(segment['start'] == ts
+                   for segment in self.manifest['segments'])
+        self.filename = segments.segment_filename(
+            self.path, self.measure, self.start_time, ts,
+            EXTENSIONS[self.method], part)
+        self.csvfilename = self.filename
+        self._open()
+        self._segment_bytes = 0
+        self._segment_rows = 0
+        self._last_ts = ts
+
+        with self._manifest_lock:
+            self.manifest['segments'].append({
+                'filename': os.path.basename(self.filename),
+                'start': ts, 'end': None, 'rows': 0})
+            segments.save_manifest(self.manifest_file, self.manifest)
+
+    def _finish_segment(self):
+        """Records the time range of the closed segment and compresses it"""
+        segment = self.manifest['segments'][-1]
+        with self._manifest_lock:
+            segment['end'] = self._last_ts
+            segment['rows'] = self._segment_rows
+            segments.save_manifest(self.manifest_file, self.manifest)
+
+        if self.compress:
+            # compress in the background so the writer is not held up
+            compressor = threading.Thread(
+                target=self._compress, args=(segment, self.filename),
+                name='compressor')
+            compressor.start()
+            self._compressors.append(compressor)
+
+    def _compress(self, segment, filename):
+        compressed = segments.compress_file(filename)
+        with self._manifest_lock:
+            segment['filename'] = os.path.basename(compressed)
+            segments.save_manifest(self.manifest_file, self.manifest)
+        os.remove(filename)
+
+    def _rotate_if_due(self, ts):
+        """Closes the current segment and opens the next one when the rows
+        of ts belong to a new segment"""
+        if ((self.rotate and ts >= self._segment_end) or
+                (self.max_bytes and self._segment_bytes >= self.max_bytes)):
+            # the buffered rows still belong to the current segment
+            self.flush()
+            with self._io_lock:
+                self.outfile.close()
+                self._finish_segment()
+                self._start_segment(ts)
+        self._last_ts = ts
+
+    def _append(self, data, rows):
+        """Writes rows now or, when buffered, hands them to the committer"""
+        self._segment_bytes += len(data)
+        self._segment_rows += rows
+        if not self.buffered:
+            self.outfile.write(data)
+            self.outfile.flush()
+            return
+
+        with self._cond:
+            self._buffer.append(data)
+            self._pending += rows
+            if self._pending >= self.max_rows:
+                self._cond.notify()
+
+    def _commit(self):
+        """Writes and flushes everything that is buffered"""
+        with self._io_lock:
+            with self._cond:
+                chunk = self._buffer
+                self._buffer = []
+                self._pending = 0
+            if chunk and not self.outfile.closed:
+                self.outfile.write(self._join(chunk))
+                self.outfile.flush()
+
+    def _join(self, chunk):
+        """Joins buffered writes into one write"""
+        if self.method == 'sql':
+            return [row for rows in chunk for row in rows]
+        if self.method == 'bin':
+            return b"".join(chunk)
+        return "".join(chunk)
+
+    def _commit_loop(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(
+                    lambda: self._closing or self._pending >= self.max_rows,
+                    timeout=self.max_delay)
+                closing = self._closing
+            self._commit()
+            if closing:
+                break
+
     def write(self, data):
         """Writes each detection event into the csv file"""
-        self.csvfile.write(f"{data}\n")
-        self.csvfile.flush()
+        assert self.method != 'bin', "write takes csv rows"
+        if self.rotating:
+            self._rotate_if_due(int(data.split(',', 1)[0]))
+        if self.method == 'sql':
+            self._append([sqlstore.parse_row(data)], 1)
+        else:
+            self._append(f"{pad_row(data)}\n", 1)
+
+    def write_detections(self, ts, detections, labels, frame=0, ns=0,
+                         seen=1, frames=1, max_simultaneous=None):
+        """Writes the detections of one frame with a single write
 
-    def close(self):
+        Arguments:
+            ts (int): timestamp of the frame
+            detections (ndarray): postprocess.DETECTION_DTYPE records
+            labels (list): label of each class id
+            frame (int): sequence number of the frame
+            ns (int): monotonic capture time of the frame in ns
+            seen (int or array): frames each detection was seen in
+            frames (int): frames the rows stand for
+            max_simultaneous (int): most detections in one of those frames;
+                defaults to the number of detections
+        """
+        counts = (seen, frames, max_simultaneous)
+        if len(detections) == 0:
+            return
+        records = None
+        if self.ring is not None:
+            # published right away, even when the file writes are buffered
+            records = to_records(ts, detections, labels, frame, ns, *counts)
+            self.ring.write(records)
+
+        if self.method == 'sql':
+            data = sqlstore.to_rows(ts, detections, labels, frame, ns,
+                                    *counts)
+        elif self.method == 'bin':
+            if records is None:
+                records = to_records(ts, detections, labels, frame, ns,
+                                     *counts)
+            data = records.tobytes()
+        else:
+            data = to_csv(ts, detections, labels, frame, ns, *counts)
+        if self.rotating:
+            self._rotate_if_due(ts)
+        self._append(data, len(detections))
+
+    def flush(self):
+        """Commits the buffered rows to the file"""
+        if self.buffered and self.outfile is not None:
+            self._commit()
+
+    def append(self, filename):
+        """Appends the detection rows of another file written by a DataHandler
+        with the same method
+
+        The header, videostart and videoend rows of that file are skipped.
+        """
+        self.flush()
+        if self.method == 'sql':
+            rows = sqlstore.query(filename, self.measure, markers=False)
+            self.outfile.write(list(rows.itertuples(index=False, name=None)))
+        elif self.method == 'bin':
+            records = read_records(filename)
+            markers = [LABEL_CODES['videostart'], LABEL_CODES['videoend']]
+            self.outfile.write(
+                records[~np.isin(records['label'], markers)].tobytes())
+        else:
+            with open(filename) as f:
+                for line in f:
+                    if line.startswith('ts,'):
+                        continue
+                    label = line.split(',', 2)[1]
+                    if label in ('videostart', 'videoend'):
+                        continue
+                    self.outfile.write(pad_row(line.rstrip('\n')) + '\n')
+        self.outfile.flush()
+
+    def close(self, end_time=None):
         """Adds the last line of data to indicate videoend and closes the file
+
+        Arguments:
+            end_time (int): ts of the videoend row; defaults to now
         """
-        end_time = int(time.time())
-        self.csvfile.write("{},{},0,0,0,0,0,0\n".format(
-            end_time, 'videoend'))
-        self.csvfile.close()
+        end_ns = time.monotonic_ns()
+        if end_time is None and self.anchor_ns:
+            end_time = self.start_time + (end_ns - self.anchor_ns) // NS
+        elif end_time is None:
+            end_time = int(time.time())
+
+        # drain the buffer before the videoend row
+        if self._committer is not None:
+            with self._cond:
+                self._closing = True
+                self._cond.notify()
+            self._committer.join()
+            atexit.unregister(self.flush)
+        self.flush()
+
+        self.outfile.write(self._marker(end_time, 'videoend', end_ns))
+        self.outfile.close()
+        if self.ring is not None:
+            self.ring.write(marker_record(end_time, 'videoend', end_ns))
+
+        if self.rotating:
+            self._last_ts = end_time
+            self._finish_segment()
+            for compressor in self._compressors:
+                compressor.join()
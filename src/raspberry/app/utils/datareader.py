@@ -3,55 +3,310 @@
 import matplotlib.pyplot as plt
 import pandas as pd
 import numpy as np
-import datetime
+
+from .datahandler import read_records, LABELS
+from .render import render
+from .rollup import RollupStore, to_seconds
+from . import segments
+from . import sqlstore
+
+# compact dtypes of the csv columns; `label` has a handful of values
+CSV_DTYPES = {
+    'ts': np.int32,
+    'label': 'category',
+    'id': np.int16,
+    'confidence': np.float32,
+    'startX': np.int16,
+    'startY': np.int16,
+    'endX': np.int16,
+    'endY': np.int16,
+    'frame': np.int32,
+    'ns': np.int64,
+    'seen': np.int16,
+    'frames': np.int16,
+    'max_simultaneous': np.int16}
+CHUNKSIZE = 2 ** 16
+# rows that mark the start and the end of a session, not detections
+MARKERS = ['videostart', 'videoend']
+
+
+def to_timeofday(ts):
+    """Returns the UTC 'HH:MM:SS' of unix seconds
+
+    The digits are computed for all ts at once and viewed as strings, so
+    there is no strftime per ts.
+    """
+    seconds = np.asarray(ts, dtype=np.int64) % 86400
+    (h, m, s) = (seconds // 3600, seconds // 60 % 60, seconds % 60)
+    chars = np.full((len(seconds), 8), ord(':'), dtype=np.uint8)
+    for col, value in zip([0, 1, 3, 4, 6, 7],
+                          [h // 10, h % 10, m // 10, m % 10, s // 10, s % 10]):
+        chars[:, col] = ord('0') + value
+    return chars.view('S8').ravel().astype('U8')
+
+
+def load_records(filename):
+    """Returns a file written with the 'bin' method of DataHandler as a
+    DataFrame with the same columns as the csv files
+
+    The file is memory mapped, so there is no text to parse.
+    """
+    return records_to_frame(read_records(filename))
+
+
+def records_to_frame(records):
+    """Returns RECORD_DTYPE records as a DataFrame with the same columns as
+    the csv files"""
+    data = {name: records[name] for name in records.dtype.names}
+    data['label'] = pd.Categorical.from_codes(records['label'],
+                                              categories=LABELS)
+    return pd.DataFrame(data, columns=list(records.dtype.names))
+
+
+def drop_markers(df):
+    """Returns the rows of a DataFrame that are not MARKERS"""
+    if 'label' not in df.columns:
+        return df
+    return df[~df['label'].isin(MARKERS)]
+
+
+def count_ids(df):
+    """Returns the number of distinct ids of every second of a DataFrame of
+    raw or clean rows as a Series indexed by ts; MARKERS are not counted"""
+    pairs = drop_markers(df)[['ts', 'id']].drop_duplicates()
+    counts = pairs['ts'].value_counts().sort_index()
+    counts.index = counts.index.astype(np.int64)
+    return counts.astype(np.int64)
+
+
+def read_counts(filename, chunksize=CHUNKSIZE):
+    """Returns the number of distinct ids of every second of a csv file
+
+    The file is streamed `chunksize` rows at a time with the compact
+    CSV_DTYPES and only the ts, label and id columns, and every chunk
+    without its MARKERS is folded into the per-second counts, so the memory
+    it takes depends on the number of seconds and not on the size of the
+    file. The ids of the last second of a chunk are carried into the next
+    one; rows are expected in ts order, as DataHandler writes them.
+
+    Arguments:
+        filename (str): path to a csv file written by DataHandler
+        chunksize (int): rows parsed at a time
+
+    Returns:
+        Series of counts indexed by ts
+    """
+    counts = []
+    carry = None
+    for chunk in pd.read_csv(filename, usecols=['ts', 'label', 'id'],
+                             dtype=CSV_DTYPES, chunksize=chunksize):
+        pairs = drop_markers(chunk)[['ts', 'id']].drop_duplicates()
+        if carry is not None:
+            pairs = pd.concat([carry, pairs]).drop_duplicates()
+        if pairs.shape[0] == 0:
+            continue
+        last = pairs['ts'].max()
+        carry = pairs[pairs['ts'] == last]
+        counts.append(pairs.loc[pairs['ts'] < last, 'ts'].value_counts())
+    if carry is not None:
+        counts.append(carry['ts'].value_counts())
+    if not counts:
+        return pd.Series(dtype=np.int64)
+    counts = pd.concat(counts).groupby(level=0).sum()
+    counts.index = counts.index.astype(np.int64)
+    return counts.astype(np.int64)
+
+
+def load_segments(manifest_file, start=None, end=None):
+    """Returns the rows of a rotated session in [start, end] as a DataFrame
+
+    Only the segments that overlap the window are opened; compressed
+    segments are read as they are.
+
+    Arguments:
+        manifest_file (str): path to a manifest written by DataHandler
+        start (int): first ts to include; None reads from the beginning
+        end (int): last ts to include; None reads to the end
+    """
+    paths = segments.segments_in_range(manifest_file, start, end)
+    if segments.load_manifest(manifest_file)['method'] == 'bin':
+        frames = [load_records(path) for path in paths]
+    else:
+        frames = [pd.read_csv(path) for path in paths]
+    df = pd.concat(frames, ignore_index=True)
+    if start is not None:
+        df = df[df['ts'] >= start]
+    if end is not None:
+        df = df[df['ts'] <= end]
+    return df.reset_index(drop=True)
 
 
 class DataReader():
-    def __init__(self, face_data, person_data, read_from='csv'):
+    def __init__(self, face_data, person_data, read_from='csv',
+                 time_range=None, chunksize=None, rollup=None,
+                 session=None):
         """Process raw object detection data and provides different plot
         outputs
 
         Arguments:
-            face_data (df)
-            person_data (df)
+            face_data (df or str): data frame or path to a csv/bin file,
+                to the sql database or to the manifest of rotated files
+            person_data (df or str): data frame or path to a csv/bin file,
+                to the sql database or to the manifest of rotated files
+            read_from (str): 'csv', 'bin', 'sql', 'manifest' or 'dataframe'
+            time_range (tuple): (start, end) ts to read from the sql
+                database or the manifest; either can be None
+            chunksize (int): stream the csv files this many rows at a time
+                and only keep the per-second counts; raw_face_data,
+                raw_person_data, clean_face_data and clean_person_data are
+                then None
+            rollup (str): path to a RollupStore file the HTR is added to and
+                the binned plots and the average HTR are read from; without
+                it the binned plots use an in-memory store and the average
+                HTR is computed from the HTR data
+            session (int): start time of the session to read from the sql
+                database; None reads every session in it
 
         Attributes:
-
+            clean_face_data, clean_person_data, x_axis_ts, x_axis_timeofday,
+            face_counts, person_counts, htr_data, avg_htr: computed on
+                first use and kept until new rows are appended
         """
-        assert read_from in ['csv', 'dataframe', 'df']
-        if read_from == 'csv':
+        assert read_from in ['csv', 'bin', 'sql', 'manifest', 'dataframe',
+                             'df']
+        # per-second counts of the files read in chunks
+        self.chunked_counts = None
+        if read_from == 'csv' and chunksize:
+            self.chunked_counts = (read_counts(face_data, chunksize),
+                                   read_counts(person_data, chunksize))
+            (face_data, person_data) = (None, None)
+        elif read_from == 'csv':
             face_data = pd.read_csv(face_data)
             person_data = pd.read_csv(person_data)
+        elif read_from == 'bin':
+            face_data = load_records(face_data)
+            person_data = load_records(person_data)
+        elif read_from == 'sql':
+            (start, end) = time_range if time_range else (None, None)
+            face_data = sqlstore.query(face_data, 'faces', start, end,
+                                       session=session)
+            person_data = sqlstore.query(person_data, 'persons', start, end,
+                                         session=session)
+        elif read_from == 'manifest':
+            (start, end) = time_range if time_range else (None, None)
+            face_data = load_segments(face_data, start, end)
+            person_data = load_segments(person_data, start, end)
         self.raw_face_data = face_data
         self.raw_person_data = person_data
-        self.clean_face_data = self.process_data(face_data)
-        self.clean_person_data = self.process_data(person_data)
         self.start_date = None
         self.end_date = None
-        self.x_axis_ts = self.get_timeframe()
-        self.x_axis_timeofday = self.ts_to_timeofday(self.x_axis_ts)
-        self.htr_data = self.get_htr_data()
-        self.avg_htr = self.get_avg_htr()
+        # derived views by key; `append` clears them
+        self._cache = {}
+        self.rollup_file = rollup
+
+    def _cached(self, key, function, *args):
+        """Returns the cached result of `key` or computes and keeps it"""
+        if key not in self._cache:
+            self._cache[key] = function(*args)
+        return self._cache[key]
+
+    def append(self, face_data=None, person_data=None):
+        """Adds raw rows and drops the views computed from the old ones
+
+        A reader loaded in chunks adds the counts of the new rows to its
+        per-second counts; the new rows are expected to be newer than the
+        ones already read.
+
+        Arguments:
+            face_data (df): new raw face rows, in the csv columns
+            person_data (df): new raw person rows, in the csv columns
+        """
+        if self.chunked_counts is not None:
+            self.chunked_counts = tuple(
+                counts if df is None else counts.add(
+                    count_ids(df), fill_value=0).astype(np.int64)
+                for (counts, df) in zip(self.chunked_counts,
+                                        [face_data, person_data]))
+            self._cache.clear()
+            return
+        if face_data is not None:
+            self.raw_face_data = pd.concat([self.raw_face_data, face_data],
+                                           ignore_index=True)
+        if person_data is not None:
+            self.raw_person_data = pd.concat(
+                [self.raw_person_data, person_data], ignore_index=True)
+        self._cache.clear()
+
+    @property
+    def clean_face_data(self):
+        if self.chunked_counts is not None:
+            # only the per-second counts are kept
+            return None
+        return self._cached('clean_face_data', self.process_data,
+                            self.raw_face_data)
+
+    @property
+    def clean_person_data(self):
+        if self.chunked_counts is not None:
+            return None
+        return self._cached('clean_person_data', self.process_data,
+                            self.raw_person_data)
+
+    @property
+    def face_counts(self):
+        if self.chunked_counts is not None:
+            return self.chunked_counts[0]
+        return self._cached('face_counts', count_ids, self.clean_face_data)
+
+    @property
+    def person_counts(self):
+        if self.chunked_counts is not None:
+            return self.chunked_counts[1]
+        return self._cached('person_counts', count_ids,
+                            self.clean_person_data)
+
+    @property
+    def x_axis_ts(self):
+        return self._cached('x_axis_ts', self.get_timeframe)
+
+    @property
+    def x_axis_timeofday(self):
+        return self._cached('x_axis_timeofday', self.ts_to_timeofday,
+                            self.x_axis_ts)
+
+    @property
+    def htr_data(self):
+        return self.get_htr_data()
+
+    @property
+    def avg_htr(self):
+        return self._cached('avg_htr', self.get_avg_htr)
+
+    @property
+    def rollup(self):
+        """RollupStore with the seconds of this reader"""
+        return self._cached('rollup', self.make_rollup)
+
+    def make_rollup(self):
+        store = RollupStore(self.rollup_file or ":memory:")
+        store.add(self.get_htr_data(time_format="unix"))
+        return store
 
     def process_data(self, raw_df):
-        """Returns a groupby object grouped by each second"""
-        raw_gb = raw_df.groupby(by=['ts', 'id'])
-        raw_gb_mean = raw_gb.mean().reset_index()
+        """Returns the mean row of every id and second, without MARKERS"""
+        raw_gb = drop_markers(raw_df).groupby(by=['ts', 'id'])
+        raw_gb_mean = raw_gb.mean(numeric_only=True).reset_index()
 
         # add object centroid to the df
-        raw_gb_mean['X'] = raw_gb_mean.apply(
-            lambda x: self.get_object_centroid(x, 'X'), axis=1)
-        raw_gb_mean['Y'] = raw_gb_mean.apply(
-            lambda x: self.get_object_centroid(x, 'Y'), axis=1)
+        raw_gb_mean['X'] = (raw_gb_mean['startX'] + raw_gb_mean['endX']) / 2
+        raw_gb_mean['Y'] = (raw_gb_mean['startY'] + raw_gb_mean['endY']) / 2
 
         # add time of day column so that we don't need to read ts
         raw_gb_mean = self.add_timeofday_col(raw_gb_mean)
         return raw_gb_mean
 
     def get_object_centroid(self, row, axis='X'):
-        """Iterates through each row to return the average of start and end
-        Pandas apply function
-        """
+        """Returns the average of start and end of one row"""
         if axis == 'X':
             return (row['startX'] + row['endX']) / 2
         elif axis == 'Y':
@@ -61,40 +316,56 @@ class DataReader():
             raise
 
     def add_timeofday_col(self, df):
-        df['dt'] = pd.to_datetime(df['ts'])
-        df['time_of_day'] = df['dt'].apply(lambda x: x.strftime('%H:%M:%S'))
-        df = df.drop('dt', axis=1)
+        df['time_of_day'] = to_timeofday(df['ts'])
         return df
 
     def ts_to_timeofday(self, l_ts):
-        timeofday = []
-        for ts in l_ts:
-            timeofday.append(
-                datetime.datetime.utcfromtimestamp(ts).strftime('%H:%M:%S'))
-        assert len(timeofday) == len(l_ts)
-        return timeofday
+        return to_timeofday(l_ts).tolist()
 
     def get_timeframe(self):
-        """Returns min and max ts from processed data"""
-        min_ts_face = self.clean_face_data['ts'].min()
-        min_ts_person = self.clean_person_data['ts'].min()
-        max_ts_face = self.clean_face_data['ts'].max()
-        max_ts_person = self.clean_person_data['ts'].min()
-        return np.arange(min(min_ts_face, min_ts_person),
-                         max(max_ts_face, max_ts_person), 1)
+        """Returns every ts from the first to the last second of either
+        measure"""
+        indexes = [counts.index for counts
+                   in [self.face_counts, self.person_counts] if len(counts)]
+        if not indexes:
+            return np.arange(0)
+        return np.arange(min(index.min() for index in indexes),
+                         max(index.max() for index in indexes) + 1)
+
+    def count_per_second(self, counts):
+        """Returns the number of ids in every second of the timeframe
+
+        Arguments:
+            counts (Series): distinct ids indexed by ts, as count_ids
+                returns; seconds without any row count 0
+        """
+        n_seconds = len(self.x_axis_ts)
+        if n_seconds == 0:
+            return np.zeros(0, dtype=np.int64)
+        offsets = counts.index.values.astype(np.int64) - self.x_axis_ts[0]
+        inside = (offsets >= 0) & (offsets < n_seconds)
+        return np.bincount(offsets[inside], weights=counts.values[inside],
+                           minlength=n_seconds).astype(np.int64)
 
     def get_htr_data(self, time_format=None):
-        count_faces = self.clean_face_data.groupby(by='ts').nunique()
-        count_persons = self.clean_person_data.groupby(by='ts').nunique()
+        """Returns the faces and persons of every second of the timeframe
 
-        infill_count_faces = [count_faces.loc[ts, 'id']
-                              if ts in count_faces.index
-                              else 0 for ts in self.x_axis_ts]
-        infill_count_persons = [count_persons.loc[ts, 'id']
-                                if ts in count_persons.index
-                                else 0 for ts in self.x_axis_ts]
+        The frame is computed once per time format and shared by every
+        caller; copy it before modifying it.
 
-        if time_format is "unix":
+        Arguments:
+            time_format (str): "unix" for ts in the 'ts' column, otherwise
+                the time of day
+        """
+        time_format = "unix" if time_format == "unix" else None
+        return self._cached(('htr_data', time_format), self.make_htr_data,
+                            time_format)
+
+    def make_htr_data(self, time_format=None):
+        infill_count_faces = self.count_per_second(self.face_counts)
+        infill_count_persons = self.count_per_second(self.person_counts)
+
+        if time_format == "unix":
             time_col = self.x_axis_ts
         else:
             time_col = self.x_axis_timeofday
@@ -113,13 +384,25 @@ class DataReader():
         pass
 
     def get_avg_htr(self):
-        return (self.htr_data['faces'] / self.htr_data['persons']).mean()
+        """Returns the mean faces / persons over the seconds with persons of
+        the timeframe
+
+        It is read from the day buckets of the rollups when a rollup file
+        was given or the rollups are already built; otherwise from the HTR
+        data, which is cheaper than building them.
+        """
+        x_axis_ts = self.x_axis_ts
+        if len(x_axis_ts) == 0:
+            return np.nan
+        if self.rollup_file or 'rollup' in self._cache:
+            return self.rollup.avg_htr(x_axis_ts[0], x_axis_ts[-1])
+        htr = self.get_htr_data(time_format="unix")
+        htr = htr[htr['persons'] > 0]
+        return (htr['faces'] / htr['persons']).mean()
 
     def resolve_extra_faces(self, df):
-        # boolean series where num of faces is greater than num of persons
-        f_gt_p = df['faces'] > df['persons']
-        for idx, row in df[f_gt_p].iterrows():
-            df.loc[idx, 'faces'] = row['persons']
+        # there cannot be more faces than persons in a second
+        df['faces'] = df['faces'].clip(upper=df['persons'])
         return df
 
     # plot methods
@@ -169,21 +452,75 @@ class DataReader():
         plt.show()
 
     def plot_attr_for_bin(self, bin_time_by):
-        htr = self.htr_data.copy()
-        htr['dt'] = htr['ts'].apply(pd.to_datetime)
-        htr_gb = htr.groupby(pd.Grouper(key='dt', freq=bin_time_by)).sum()
-        X = htr_gb.index
+        return self._cached(('bin', bin_time_by), self.make_attr_for_bin,
+                            bin_time_by)
+
+    def get_binned_htr(self, bin_time_by):
+        """Returns the faces and persons of every bin of the timeframe, with
+        the bin start in unix seconds in 'ts'"""
+        x_axis_ts = self.x_axis_ts
+        start = x_axis_ts[0] if len(x_axis_ts) else None
+        end = x_axis_ts[-1] if len(x_axis_ts) else None
+        return self.rollup.binned(to_seconds(bin_time_by), start, end)
+
+    def make_attr_for_bin(self, bin_time_by):
+        htr_gb = self.get_binned_htr(bin_time_by)
+        X = pd.to_datetime(htr_gb['ts'], unit='s')
         Y1 = htr_gb['faces']
         Y2 = htr_gb['persons'] - htr_gb['faces']
         title = f"Pedestrians and Head-Turns Per {bin_time_by.capitalize()}"
         return X, Y1, Y2, title
 
-    def plotbar(self, metric='face', figsize=(6, 6), timestep=5):
+    def export(self, filename, kind='line', metric=None, bin_time_by=None,
+               figsize=(8, 4), dpi=100):
+        """Renders the HTR to a PNG or SVG file without a display
+
+        The series are reduced to the pixel columns of the figure before
+        they are drawn: lines and areas to the minimum and maximum of each
+        column and bars to one bar with the sum of each column, so a day
+        draws no more points or bars than an hour.
+
+        Arguments:
+            filename (str): output file; '.png' or '.svg'
+            kind (str): 'line', 'bar' or 'stackarea'; bars and areas stack
+                the faces on the other persons
+            metric (str): 'face' or 'person' to only draw one of them
+            bin_time_by (str): sum the seconds into bins such as "15Min"
+        """
+        if bin_time_by is None:
+            step = 1
+            htr = self.get_htr_data(time_format="unix")
+        else:
+            step = to_seconds(bin_time_by)
+            htr = self.get_binned_htr(bin_time_by)
+        faces = htr['faces'].values
+        persons = htr['persons'].values
+
+        if metric == 'face':
+            series = {'faces': faces}
+        elif metric == 'person':
+            series = {'persons': persons}
+        elif kind == 'line':
+            series = {'faces': faces, 'persons': persons}
+        else:
+            series = {'faces': faces, 'other persons': persons - faces}
+        per = "Second" if bin_time_by is None else bin_time_by.capitalize()
+        return render(htr['ts'].values, series, filename, kind=kind,
+                      title=f"Pedestrians and Head-Turns Per {per}",
+                      ylabel='persons', step=step, figsize=figsize, dpi=dpi)
+
+    def plotbar(self, metric='face', figsize=(6, 6), timestep=5,
+                filename=None):
         """
 
         Arguments:
             metric (str): 'face' or 'persons'
+            filename (str): render to this PNG or SVG file instead of
+                showing the plot, see export
         """
+        if filename is not None:
+            return self.export(filename, kind='bar', metric=metric,
+                               figsize=figsize)
         fig, ax = plt.subplots(figsize=figsize)
         X = self.x_axis_timeofday
 
@@ -199,12 +536,18 @@ class DataReader():
         ax.set_xticks(xticks[::timestep])
         plt.show()
 
-    def plotline(self, metric='face', figsize=(6, 6), timestep=5):
+    def plotline(self, metric='face', figsize=(6, 6), timestep=5,
+                 filename=None):
         """
 
         Arguments:
             metric (str): 'face' or 'persons'
+            filename (str): render to this PNG or SVG file instead of
+                showing the plot, see export
         """
+        if filename is not None:
+            return self.export(filename, kind='line', metric=metric,
+                               figsize=figsize)
         fig, ax = plt.subplots(figsize=figsize)
         X = self.x_axis_timeofday
         if metric == 'face':
@@ -0,0 +1,254 @@
+"""Detector objects that wrap the Caffe models used by the measure apps.
+
+Source: This code was modified from code provided by PyImageSearch.
+"""
+import numpy as np
+import cv2
+
+from .backend import configure, select_backend
+from .postprocess import filter_detections, DETECTION_DTYPE, BOX_FIELDS
+
+# initialize the list of class labels MobileNet SSD was trained to
+# detect, then generate a set of bounding box colors for each class
+CLASSES = ["background", "aeroplane", "bicycle", "bird", "boat",
+           "bottle", "bus", "car", "cat", "chair", "cow", "diningtable",
+           "dog", "horse", "motorbike", "person", "pottedplant", "sheep",
+           "sofa", "train", "tvmonitor"]
+
+# only detect persons
+IGNORE = set(["background", "aeroplane", "bicycle", "bird", "boat",
+              "bottle", "bus", "car", "cat", "chair", "cow", "diningtable",
+              "dog", "horse", "motorbike", "pottedplant", "sheep",
+              "sofa", "train", "tvmonitor"])
+
+KEEP_CLASSES = [idx for idx, label in enumerate(CLASSES)
+                if label not in IGNORE]
+
+COLORS = np.random.uniform(0, 255, size=(len(CLASSES), 3))
+
+# both models were trained on a 300x300 input
+INPUT_SIZE = (300, 300)
+
+
+class Detector():
+    measure = None
+    # label of each class id and the class ids to keep (None keeps all)
+    labels = None
+    keep_classes = None
+    # preprocessing of the resized frame into the input blob
+    scalefactor = 1.0
+    mean = 0.0
+    input_size = INPUT_SIZE
+
+    def __init__(self, prototxt, model, min_confidence=0.5,
+                 backend='default', target='cpu', input_size=INPUT_SIZE):
+        """Loads a serialized Caffe model and runs it on single frames.
+
+        Arguments:
+            prototxt (str): path to Caffe 'deploy' prototxt file
+            model (str): path to Caffe pre-trained model
+            min_confidence (float): minimum probability to filter weak
+                detections
+            backend (str): DNN backend, see backend.BACKENDS; 'auto' picks
+                the fastest CPU backend and thread count for this host
+            target (str): DNN target, see backend.TARGETS; ignored by 'auto'
+            input_size (tuple): (width, height) of the input blob
+        """
+        self.net = cv2.dnn.readNetFromCaffe(prototxt, model)
+        self.min_confidence = min_confidence
+        self.input_size = tuple(input_size)
+        if backend == 'auto':
+            select_backend(self.net, model, self.input_size)
+        else:
+            configure(self.net, backend, target)
+
+    def blob(self, resized):
+        """Converts a resized frame into the input blob of the model"""
+        return cv2.dnn.blobFromImage(resized, self.scalefactor,
+                                     self.input_size, self.mean)
+
+    def blobs(self, resized_frames):
+        """Stacks resized frames into one input blob of the model"""
+        return cv2.dnn.blobFromImages(resized_frames, self.scalefactor,
+                                      self.input_size, self.mean)
+
+    def detect(self, frame, resized=None):
+        """Returns the detections of the model for a frame
+
+        Arguments:
+            frame (ndarray): frame that the boxes are scaled to
+            resized (ndarray): the frame already resized to the input size;
+                pass it in when several detectors share one frame
+
+        Returns:
+            ndarray of postprocess.DETECTION_DTYPE
+        """
+        if resized is None:
+            resized = cv2.resize(frame, self.input_size)
+
+        # pass the blob through the network and obtain the detections and
+        # predictions
+        self.net.setInput(self.blob(resized))
+        detections = self.net.forward()
+
+        (h, w) = frame.shape[:2]
+        return filter_detections(detections, w, h, self.min_confidence,
+                                 self.keep_classes)
+
+    def forward_batch(self, resized_frames):
+        """Runs one forward pass on resized frames and returns the raw
+        (N, 7) rows of each frame"""
+        self.net.setInput(self.blobs(resized_frames))
+        detections = self.net.forward()
+
+        # the first column of every row is the index of the frame in the
+        # batch; split the rows back into per-frame results
+        rows = detections.reshape(-1, 7)
+        image = rows[:, 0].astype(np.int32)
+        return [rows[image == n] for n in range(len(resized_frames))]
+
+    def detect_batch(self, frames, resized_frames=None, context=None):
+        """Returns the detections of the model for several frames with one
+        forward pass
+
+        Arguments:
+            frames (list): frames that the boxes are scaled to
+            resized_frames (list): the frames already resized to the input
+                size
+            context (dict): detections of the detectors that already ran on
+                the batch, by measure; unused by the plain detectors
+
+        Returns:
+            list of ndarray of postprocess.DETECTION_DTYPE, one per frame
+        """
+        if resized_frames is None:
+            resized_frames = [cv2.resize(frame, self.input_size)
+                              for frame in frames]
+        if len(frames) == 1:
+            return [self.detect(frames[0], resized_frames[0])]
+
+        results = []
+        for frame, rows in zip(frames, self.forward_batch(resized_frames)):
+            (h, w) = frame.shape[:2]
+            results.append(filter_detections(
+                rows, w, h, self.min_confidence, self.keep_classes))
+        return results
+
+    def draw(self, frame, detections):
+        """Draws the bounding boxes and probabilities on the frame"""
+        raise NotImplementedError
+
+
+class FaceDetector(Detector):
+    measure = 'faces'
+    labels = ['background', 'face']
+    scalefactor = 1.0
+    mean = (104.0, 177.0, 123.0)
+
+    def draw(self, frame, detections):
+        for (i, class_id, confidence, startX, startY, endX, endY) \
+                in detections.tolist():
+            text = "{:.2f}%".format(confidence * 100)
+            y = startY - 10 if startY - 10 > 10 else startY + 10
+            cv2.rectangle(frame, (startX, startY), (endX, endY),
+                          (0, 0, 255), 2)
+            cv2.putText(frame, text, (startX, y), cv2.FONT_HERSHEY_SIMPLEX,
+                        0.45, (0, 0, 255), 2)
+
+
+class PersonDetector(Detector):
+    measure = 'persons'
+    labels = CLASSES
+    keep_classes = KEEP_CLASSES
+    scalefactor = 0.007843
+    mean = 127.5
+
+    def draw(self, frame, detections):
+        for (i, idx, confidence, startX, startY, endX, endY) \
+                in detections.tolist():
+            prediction = "{}: {:.2f}%".format(CLASSES[idx], confidence * 100)
+            cv2.rectangle(frame, (startX, startY), (endX, endY),
+                          COLORS[idx], 2)
+            y = startY - 15 if startY - 15 > 15 else startY + 15
+            cv2.putText(frame, prediction, (startX, y),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, COLORS[idx], 2)
+
+
+class CascadeFaceDetector(FaceDetector):
+    """Runs the face detector only on crops around detected persons.
+
+    The crop is a square as wide as the person box, anchored at its top,
+    where the head of a standing person is. All crops of a batch go through
+    one forward pass. Small, distant faces fill more of the model input
+    than in the whole frame, and with few people in view the face net does
+    less work. Each person keeps at most its most confident face, which gets
+    the id of the person, so every face is tied to a person box.
+    """
+    def __init__(self, prototxt, model, min_confidence=0.5,
+                 backend='default', target='cpu', input_size=INPUT_SIZE,
+                 padding=0.15):
+        """
+        Arguments:
+            prototxt (str): path to Caffe 'deploy' prototxt file
+            model (str): path to Caffe pre-trained model
+            min_confidence (float): minimum probability to filter weak
+                detections
+            backend (str): DNN backend, see Detector
+            target (str): DNN target, see Detector
+            input_size (tuple): (width, height) of the input blob
+            padding (float): share of the person width added around the crop
+        """
+        super().__init__(prototxt, model, min_confidence, backend, target,
+                         input_size)
+        self.padding = padding
+
+    def crop_box(self, person, w, h):
+        """Returns the head crop (x1, y1, x2, y2) of a person in the frame"""
+        (startX, startY, endX, endY) = person
+        pad = int((endX - startX) * self.padding)
+        side = (endX - startX) + 2 * pad
+        x1 = max(0, startX - pad)
+        y1 = max(0, startY - pad)
+        x2 = min(w, startX - pad + side)
+        y2 = min(h, startY - pad + side, endY)
+        return (x1, y1, x2, y2)
+
+    def detect_batch(self, frames, resized_frames=None, context=None):
+        assert context is not None and 'persons' in context, \
+            "the person detector has to run before the cascade"
+        results = [np.zeros(0, dtype=DETECTION_DTYPE) for frame in frames]
+
+        crops = []
+        owners = []
+        for n, (frame, persons) in enumerate(zip(frames, context['persons'])):
+            (h, w) = frame.shape[:2]
+            for person in persons:
+                (x1, y1, x2, y2) = self.crop_box(
+                    person[BOX_FIELDS].tolist(), w, h)
+                if x2 - x1 < 2 or y2 - y1 < 2:
+                    continue
+                crops.append(cv2.resize(frame[y1:y2, x1:x2],
+                                        self.input_size))
+                owners.append((n, person['id'], x1, y1, x2 - x1, y2 - y1))
+        if not crops:
+            return results
+
+        faces = {}
+        for rows, (n, person_id, x1, y1, cw, ch) in zip(
+                self.forward_batch(crops), owners):
+            found = filter_detections(rows, cw, ch, self.min_confidence)
+            if len(found) == 0:
+                continue
+
+            # keep the best face of the person and move it into the frame
+            face = found[np.argmax(found['confidence'])].copy()
+            face['id'] = person_id
+            face['startX'] += x1
+            face['endX'] += x1
+            face['startY'] += y1
+            face['endY'] += y1
+            faces.setdefault(n, []).append(face)
+
+        for n, found in faces.items():
+            results[n] = np.array(found, dtype=DETECTION_DTYPE)
+        return results
@@ -0,0 +1,57 @@
+"""Class object that skips the DNN on frames where nothing has changed.
+
+The frame is shrunk to a small grey image and compared with the last frame
+the detectors ran on. When the share of changed pixels stays below the
+sensitivity, the frame is gated and the last detections are carried forward.
+"""
+import numpy as np
+import cv2
+
+
+class MotionGate():
+    def __init__(self, sensitivity=0.01, max_skip=30, width=80,
+                 pixel_threshold=25):
+        """Decides per frame whether the detectors have to run.
+
+        Arguments:
+            sensitivity (float): share of changed pixels that counts as motion
+            max_skip (int): the detectors run at least once every
+                `max_skip` + 1 frames, even without motion
+            width (int): width of the downscaled grey frame
+            pixel_threshold (int): grey level change that counts as a changed
+                pixel
+        """
+        self.sensitivity = sensitivity
+        self.max_skip = max_skip
+        self.width = width
+        self.pixel_threshold = pixel_threshold
+        self.reference = None
+        self.skipped = 0
+        self.gated = 0
+
+    def prepare(self, frame):
+        """Returns the downscaled, blurred grey frame"""
+        (h, w) = frame.shape[:2]
+        height = max(1, h * self.width // w)
+        small = cv2.resize(frame, (self.width, height),
+                           interpolation=cv2.INTER_AREA)
+        grey = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(grey, (5, 5), 0)
+
+    def changed(self, grey):
+        """Returns the share of pixels that changed since the reference"""
+        diff = cv2.absdiff(grey, self.reference)
+        return np.count_nonzero(diff > self.pixel_threshold) / diff.size
+
+    def has_motion(self, frame):
+        """Returns True if the detectors have to run on the frame"""
+        grey = self.prepare(frame)
+        if (self.reference is None or self.skipped >= self.max_skip or
+                self.changed(grey) >= self.sensitivity):
+            self.reference = grey
+            self.skipped = 0
+            return True
+
+        self.skipped += 1
+        self.gated += 1
+        return False
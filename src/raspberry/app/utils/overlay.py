@@ -0,0 +1,58 @@
+"""Debug window that draws the detections on the video feed.
+
+Drawing and the GUI event pump run on their own thread at a reduced rate so
+the capture loop only hands over the latest frame and never waits on them.
+"""
+import threading
+import cv2
+
+
+class Overlay(threading.Thread):
+    def __init__(self, detectors, fps=5, window="Frame"):
+        """Shows the latest frame with its detections.
+
+        Arguments:
+            detectors (list): Detector objects used to draw the detections
+            fps (float): maximum rate at which the window is refreshed
+            window (str): name of the window
+        """
+        super().__init__(daemon=True)
+        self.detectors = detectors
+        self.interval = 1.0 / fps
+        self.window = window
+        self.quit = threading.Event()
+        self._stopped = threading.Event()
+        self._lock = threading.Lock()
+        self._latest = None
+
+    def update(self, frame, detections):
+        """Hands over a frame and the detections of each detector"""
+        with self._lock:
+            self._latest = (frame, detections)
+
+    def run(self):
+        while not self._stopped.is_set():
+            with self._lock:
+                latest, self._latest = self._latest, None
+
+            if latest is not None:
+                frame, detections = latest
+                frame = frame.copy()
+                for detector, results in zip(self.detectors, detections):
+                    detector.draw(frame, results)
+
+                # show the output frame
+                cv2.imshow(self.window, frame)
+
+            # if the `q` key was pressed, ask the capture loop to stop
+            key = cv2.waitKey(1) & 0xFF
+            if key == ord("q"):
+                self.quit.set()
+
+            self._stopped.wait(self.interval)
+
+        cv2.destroyAllWindows()
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
@@ -0,0 +1,333 @@
+"""Staged capture -> inference -> writer pipeline for the measure apps.
+
+Every stage runs on its own thread and the stages are connected by bounded
+queues, so a slow SD-card write no longer stalls `net.forward()` and the
+slowest stage alone sets the sustained FPS. When inference falls behind the
+camera, the frame queue applies an overload policy:
+
+    'drop_oldest': discard the oldest queued frame (freshest data wins)
+    'drop_newest': discard the frame that was just captured
+    'block': make the capture stage wait (no frame is lost)
+
+Detection results are never dropped; the writer queue always blocks.
+
+With `batch_size` > 1 the inference stage stacks up to that many queued
+frames into one forward pass per detector, waiting at most `max_wait`
+seconds for a batch to fill. This pays off for files and multi-core boxes
+where the per-call overhead of `net.forward()` dominates. An optional
+MotionGate skips the detectors on frames where nothing moved.
+
+Every frame is stamped once, when it is captured, with a sequence number and
+a monotonic ns time; the unix second `ts` is derived from that stamp.
+"""
+import queue
+import threading
+import time
+import cv2
+import imutils
+
+from .clock import FrameClock
+
+POLICIES = ['drop_oldest', 'drop_newest', 'block']
+
+# marks the end of the stream; it is never dropped
+STOP = object()
+
+
+class FrameQueue():
+    def __init__(self, maxsize, policy='block'):
+        """Bounded queue that counts its drops and its deepest fill.
+
+        Arguments:
+            maxsize (int): number of items the queue holds
+            policy (str): 'drop_oldest', 'drop_newest' or 'block'
+        """
+        assert policy in POLICIES
+        assert maxsize > 0
+        self.policy = policy
+        self.queue = queue.Queue(maxsize)
+        self.dropped = 0
+        self.max_depth = 0
+        self.closed = threading.Event()
+
+    def put(self, item):
+        """Adds an item and applies the overload policy when full"""
+        if item is STOP or self.policy == 'block':
+            self._put_blocking(item)
+        elif self.policy == 'drop_newest':
+            try:
+                self.queue.put_nowait(item)
+            except queue.Full:
+                self.dropped += 1
+        else:
+            while True:
+                try:
+                    self.queue.put_nowait(item)
+                    break
+                except queue.Full:
+                    try:
+                        self.queue.get_nowait()
+                        self.dropped += 1
+                    except queue.Empty:
+                        pass
+        self.max_depth = max(self.max_depth, self.queue.qsize())
+
+    def _put_blocking(self, item):
+        # wake up regularly so a dead consumer cannot hang the producer
+        while not self.closed.is_set():
+            try:
+                self.queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def get(self, timeout=None):
+        return self.queue.get(timeout=timeout)
+
+    def depth(self):
+        return self.queue.qsize()
+
+    def close(self):
+        """Stops producers from waiting on a queue nobody reads anymore"""
+        self.closed.set()
+
+
+class Pipeline():
+    def __init__(self, source, detectors, handlers, control, overlay=None,
+                 queue_size=4, policy='drop_oldest', width=400, clock=None,
+                 batch_size=1, max_wait=0.05, gate=None, track_latency=False,
+                 first_frame=0):
+        """Runs the detectors on a frame source with one thread per stage.
+
+        Arguments:
+            source: object with a `read()` method that returns
+                (grabbed, frame), e.g. cv2.VideoCapture
+            detectors (list): Detector objects to run on every frame
+            handlers (list): DataHandler objects, one per detector
+            control (RunControl): decides when the capture stage stops
+            overlay (Overlay): optional debug window
+            queue_size (int): number of frames queued between capture and
+                inference
+            policy (str): overload policy of the frame queue
+            width (int): frames are resized to this width
+            clock (callable): returns the ts of the frame that was just read
+                from its monotonic ns stamp; defaults to a FrameClock
+            batch_size (int): frames stacked into one forward pass
+            max_wait (float): seconds a partial batch waits for more frames
+            gate (MotionGate): skips the detectors on frames without motion
+            track_latency (bool): keep the capture-to-written seconds of
+                every frame in `latencies`
+            first_frame (int): sequence number of the first frame, e.g. its
+                index in a video file
+        """
+        assert len(detectors) == len(handlers)
+        self.source = source
+        self.detectors = detectors
+        self.handlers = handlers
+        self.control = control
+        self.overlay = overlay
+        self.width = width
+        if clock is None:
+            clock = FrameClock()
+        self.clock = clock
+        self.first_frame = first_frame
+        self.first_ns = None
+        self.last_ns = None
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.gate = gate
+        self.last_detections = None
+
+        # detectors with different input sizes resize the frame themselves
+        input_sizes = set(detector.input_size for detector in detectors)
+        self.input_size = input_sizes.pop() if len(input_sizes) == 1 else None
+        # a batch has to fit in the frame queue
+        queue_size = max(queue_size, batch_size)
+        self.frames = FrameQueue(queue_size, policy)
+        self.results = FrameQueue(queue_size, 'block')
+        self.captured = 0
+        self.processed = 0
+        self.batches = 0
+        self.written = 0
+        self.elapsed = 0
+        self.error = None
+        self.latencies = [] if track_latency else None
+
+    def capture(self):
+        """Reads, resizes and timestamps frames"""
+        while not self.control.should_stop():
+            (grabbed, frame) = self.source.read()
+            # stamp the frame when it is captured, before any resizing
+            ns = time.monotonic_ns()
+            if not grabbed:
+                break
+
+            # resize the frame to have a maximum width of 400 pixels and,
+            # once for all detectors, to their input size
+            frame = imutils.resize(frame, width=self.width)
+            resized = None
+            if self.input_size is not None:
+                resized = cv2.resize(frame, self.input_size)
+            now = self.clock(ns)
+            # dropped frames leave gaps in the sequence numbers
+            seq = self.first_frame + self.captured
+            if self.first_ns is None:
+                self.first_ns = ns
+            self.last_ns = ns
+
+            self.frames.put((now, seq, ns, frame, resized))
+            self.captured += 1
+
+    def next_batch(self):
+        """Returns up to `batch_size` frames and whether the stream ended
+
+        The batch is handed over once it is full or `max_wait` seconds after
+        its first frame arrived, whichever comes first.
+        """
+        item = self.frames.get()
+        if item is STOP:
+            return [], True
+        batch = [item]
+        deadline = time.time() + self.max_wait
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            try:
+                item = self.frames.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def infer(self):
+        """Runs every detector on each batch of frames"""
+        ended = False
+        while not ended:
+            batch, ended = self.next_batch()
+            if not batch:
+                break
+            (stamps, seqs, stamps_ns, frames, resized) = zip(*batch)
+
+            # frames without motion skip the detectors
+            if self.gate is None:
+                run = list(range(len(batch)))
+            else:
+                run = [n for n, frame in enumerate(frames)
+                       if self.gate.has_motion(frame)]
+
+            # one forward pass per detector for the frames that run
+            if run:
+                resized_run = None
+                if self.input_size is not None:
+                    resized_run = [resized[n] for n in run]
+
+                # later detectors can use the results of earlier ones, e.g.
+                # the face cascade runs on the person boxes
+                context = {}
+                batch_detections = []
+                for detector in self.detectors:
+                    detections = detector.detect_batch(
+                        [frames[n] for n in run], resized_run,
+                        context=context)
+                    context[detector.measure] = detections
+                    batch_detections.append(detections)
+                self.batches += 1
+            position = {n: i for i, n in enumerate(run)}
+
+            for n, now in enumerate(stamps):
+                # gated frames carry the last detections forward
+                if n in position:
+                    self.last_detections = [
+                        detections[position[n]]
+                        for detections in batch_detections]
+                self.results.put(
+                    (now, seqs[n], stamps_ns[n], self.last_detections))
+
+                self.processed += 1
+                self.control.tick()
+
+            if self.overlay is not None:
+                self.overlay.update(frames[-1], self.last_detections)
+                if self.overlay.quit.is_set():
+                    self.control.stop()
+
+    def write(self):
+        """Persists the detections of each frame"""
+        while True:
+            item = self.results.get()
+            if item is STOP:
+                break
+            (now, seq, ns, frame_detections) = item
+
+            # NN: write to output files
+            for detector, results, detections in zip(
+                    self.detectors, self.handlers, frame_detections):
+                results.write_detections(now, detections, detector.labels,
+                                         frame=seq, ns=ns)
+            self.written += 1
+
+            if self.latencies is not None:
+                self.latencies.append((time.monotonic_ns() - ns) / 1e9)
+
+    def stage(self, target, upstream, downstream):
+        """Runs a stage and always passes the end of stream downstream"""
+        try:
+            target()
+        except Exception as exc:
+            self.error = exc
+            self.control.stop()
+            # nobody reads the input of this stage anymore
+            if upstream is not None:
+                upstream.close()
+        finally:
+            if downstream is not None:
+                downstream.put(STOP)
+
+    def run(self):
+        """Runs the pipeline until the source ends or the control stops it
+        and returns the stats"""
+        threads = [
+            threading.Thread(target=self.stage, name='capture',
+                             args=(self.capture, None, self.frames)),
+            threading.Thread(target=self.stage, name='inference',
+                             args=(self.infer, self.frames, self.results)),
+            threading.Thread(target=self.stage, name='writer',
+                             args=(self.write, self.results, None))]
+
+        start = time.time()
+        for thread in threads:
+            thread.start()
+
+        # join with a timeout so the main thread keeps handling signals
+        while any(thread.is_alive() for thread in threads):
+            for thread in threads:
+                thread.join(timeout=0.5)
+        self.elapsed = time.time() - start
+
+        if self.error is not None:
+            raise self.error
+        return self.stats()
+
+    def stats(self):
+        """Returns the frame counters and queue depths"""
+        capture_fps = 0
+        if self.captured > 1 and self.last_ns > self.first_ns:
+            capture_fps = (self.captured - 1) * 1e9 / (
+                self.last_ns - self.first_ns)
+        return {
+            'captured': self.captured,
+            'processed': self.processed,
+            'written': self.written,
+            'batches': self.batches,
+            'gated': self.gate.gated if self.gate is not None else 0,
+            'dropped': self.frames.dropped,
+            'frame_queue_depth': self.frames.depth(),
+            'frame_queue_max_depth': self.frames.max_depth,
+            'result_queue_depth': self.results.depth(),
+            'result_queue_max_depth': self.results.max_depth,
+            'elapsed': self.elapsed,
+            'fps': self.processed / self.elapsed if self.elapsed else 0,
+            'capture_fps': capture_fps}
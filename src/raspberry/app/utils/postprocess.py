@@ -0,0 +1,95 @@
+"""Functions that turn the raw output of the SSD models into detections.
+
+Both Caffe models return a (1, 1, N, 7) tensor where every row is
+[batch_id, class_id, confidence, startX, startY, endX, endY] with the box in
+relative coordinates. The rows are filtered with NumPy masks instead of a
+Python loop over N, which matters on the Pi where MobileNetSSD returns 100
+candidates per frame.
+"""
+import numpy as np
+
+# one compact record per detection; `id` is the row of the detection in the
+# network output, which is what the csv files have always recorded
+DETECTION_DTYPE = np.dtype([
+    ('id', np.int16),
+    ('class_id', np.int16),
+    ('confidence', np.float32),
+    ('startX', np.int16),
+    ('startY', np.int16),
+    ('endX', np.int16),
+    ('endY', np.int16)])
+
+BOX_FIELDS = ['startX', 'startY', 'endX', 'endY']
+
+
+def filter_detections(detections, w, h, min_confidence=0.5,
+                      keep_classes=None):
+    """Returns the detections above the threshold with boxes in pixels
+
+    Arguments:
+        detections (ndarray): (1, 1, N, 7) output of `net.forward()`
+        w (int): width of the frame the boxes are scaled to
+        h (int): height of the frame the boxes are scaled to
+        min_confidence (float): minimum probability to filter weak detections
+        keep_classes (list): class ids to keep; None keeps every class
+
+    Returns:
+        ndarray of DETECTION_DTYPE
+    """
+    rows = detections.reshape(-1, 7)
+
+    mask = rows[:, 2] > min_confidence
+    if keep_classes is not None:
+        mask &= np.isin(rows[:, 1].astype(np.int16), keep_classes)
+    ids = np.flatnonzero(mask)
+    kept = rows[ids]
+
+    # scale every box in one multiply and keep them inside the frame
+    boxes = kept[:, 3:7] * np.array([w, h, w, h], dtype=np.float32)
+    boxes = np.clip(boxes, 0, np.array([w - 1, h - 1, w - 1, h - 1],
+                                       dtype=np.float32))
+
+    results = np.empty(len(ids), dtype=DETECTION_DTYPE)
+    results['id'] = ids
+    results['class_id'] = kept[:, 1]
+    results['confidence'] = kept[:, 2]
+    for col, field in enumerate(BOX_FIELDS):
+        results[field] = boxes[:, col]
+    return results
+
+
+def pad_row(data):
+    """Returns a csv row with the columns older files do not have: zeros
+    for the frame and ns, and the counts of one frame"""
+    commas = data.count(',')
+    if commas == 7:
+        data += ",0,0"
+    if commas <= 9:
+        data += ",1,1,1"
+    return data
+
+
+def to_csv(ts, detections, labels, frame=0, ns=0, seen=1, frames=1,
+           max_simultaneous=None):
+    """Returns the csv rows of the detections of one frame as one string
+
+    Arguments:
+        ts (int): timestamp of the frame
+        detections (ndarray): DETECTION_DTYPE records
+        labels (list): label of each class id
+        frame (int): sequence number of the frame
+        ns (int): monotonic capture time of the frame in ns
+        seen (int or array): frames each detection was seen in
+        frames (int): frames the row stands for
+        max_simultaneous (int): most detections in one of those frames;
+            defaults to the number of detections
+    """
+    if max_simultaneous is None:
+        max_simultaneous = len(detections)
+    seen = np.broadcast_to(seen, len(detections)).tolist()
+    return "".join(
+        "{},{},{},{:.2f},{},{},{},{},{},{},{},{},{}\n".format(
+            ts, labels[class_id], i, confidence, startX, startY, endX, endY,
+            frame, ns, n_seen, frames, max_simultaneous)
+        for ((i, class_id, confidence, startX, startY, endX, endY), n_seen)
+        in zip(detections.tolist(), seen))
@@ -0,0 +1,117 @@
+"""Headless rendering of the HTR series to PNG or SVG files.
+
+A day has 86400 seconds but a plot is a few hundred pixels wide, so the
+series are reduced to the minimum and maximum of every pixel column before
+they are drawn; the peaks survive and matplotlib draws a few thousand points
+instead of every second. Bars are summed into at most one wider bar per pixel
+column instead. The figures are drawn on an Agg canvas, which needs no
+display and leaves the pyplot backend alone.
+"""
+import numpy as np
+import pandas as pd
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+import matplotlib.dates as mdates
+
+KINDS = ['line', 'bar', 'stackarea']
+COLORS = {'faces': '#5392ff', 'persons': '#ff5c49',
+          'other persons': '#ff5c49'}
+
+
+def minmax_indices(y, n_buckets):
+    """Returns the sorted indices of the minimum and the maximum of each of
+    `n_buckets` consecutive buckets of y, plus the first and last index"""
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+    if n <= 2 * n_buckets:
+        return np.arange(n)
+    size = -(-n // n_buckets)
+    # pad with the last value so that every bucket has `size` values
+    padded = np.concatenate([y, np.full(size * n_buckets - n, y[-1])])
+    padded = padded.reshape(n_buckets, size)
+    starts = np.arange(n_buckets) * size
+    indices = np.concatenate([starts + padded.argmin(axis=1),
+                              starts + padded.argmax(axis=1), [0, n - 1]])
+    return np.unique(np.minimum(indices, n - 1))
+
+
+def downsample(ts, series, n_buckets):
+    """Returns ts and every series of a dict at the union of their min/max
+    indices, so that stacked series keep a shared x axis"""
+    indices = np.unique(np.concatenate(
+        [minmax_indices(y, n_buckets) for y in series.values()]))
+    return (np.asarray(ts)[indices],
+            {name: np.asarray(y)[indices] for name, y in series.items()})
+
+
+def bucket_sums(ts, series, n_buckets):
+    """Returns the first ts, the sums of every series of a dict over at most
+    `n_buckets` buckets of consecutive points and the points per bucket"""
+    size = max(1, -(-len(ts) // n_buckets))
+    starts = np.arange(0, len(ts), size)
+    if len(starts) == 0:
+        return ts, series, size
+    return (np.asarray(ts)[starts],
+            {name: np.add.reduceat(np.asarray(y), starts)
+             for name, y in series.items()}, size)
+
+
+def render(ts, series, filename, kind='line', title=None, ylabel=None,
+           step=1, figsize=(8, 4), dpi=100, max_points=True):
+    """Draws series over unix seconds into a PNG or SVG file
+
+    Arguments:
+        ts (array): unix seconds of the points, `step` apart
+        series (dict): name ('faces' or 'persons') -> values; a stackarea
+            stacks them in order
+        filename (str): output file; the extension picks the format
+        kind (str): 'line', 'bar' or 'stackarea'
+        step (int): seconds per point, the width of the bars
+        max_points (bool): reduce the series to the pixel columns first; the
+            bars of a column are summed into one
+    """
+    fig = draw(ts, series, kind, title, ylabel, step, figsize, dpi,
+               max_points)
+    fig.savefig(filename)
+    return filename
+
+
+def draw(ts, series, kind='line', title=None, ylabel=None, step=1,
+         figsize=(8, 4), dpi=100, max_points=True):
+    """Returns the Figure of render without saving it"""
+    assert kind in KINDS
+    n_buckets = int(figsize[0] * dpi)
+    if max_points and kind == 'bar':
+        (ts, series, size) = bucket_sums(ts, series, n_buckets)
+        step = step * size
+    elif max_points:
+        (ts, series) = downsample(ts, series, n_buckets)
+    x = pd.to_datetime(np.asarray(ts), unit='s')
+
+    fig = Figure(figsize=figsize, dpi=dpi)
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot(1, 1, 1)
+    names = list(series)
+    if kind == 'line':
+        for name in names:
+            ax.plot(x, series[name], color=COLORS.get(name), label=name,
+                    linewidth=0.8)
+    elif kind == 'bar':
+        bottom = np.zeros(len(x))
+        for name in names:
+            ax.bar(x, series[name], bottom=bottom, width=step / 86400,
+                   color=COLORS.get(name), label=name, align='edge')
+            bottom = bottom + np.asarray(series[name])
+    else:
+        ax.stackplot(x, np.array([series[name] for name in names]),
+                     labels=names, colors=[COLORS.get(n) for n in names],
+                     edgecolor='white')
+    ax.xaxis.set_major_formatter(mdates.DateFormatter('%H:%M'))
+    ax.set_xlabel('time')
+    if ylabel is not None:
+        ax.set_ylabel(ylabel)
+    if title is not None:
+        ax.set_title(title)
+    ax.legend()
+    fig.tight_layout()
+    return fig
@@ -0,0 +1,139 @@
+"""Fixed-size ring buffer of detection records in a memory-mapped file.
+
+The capture process publishes RECORD_DTYPE records (the format of the 'bin'
+method) into a file on /dev/shm, so local consumers such as the dashboard
+streamer get them without re-reading and parsing the csv files. The file is a
+16-byte header followed by `capacity` record slots:
+
+    magic (u4) | capacity (u4) | head (u8) | slot 0 | slot 1 | ...
+
+`head` counts every record ever written; record n lives in slot
+n % capacity. There is a single writer: it holds an exclusive flock on the
+ring file, and a second writer on the same path fails instead of clobbering
+the slots. Every reader keeps its own cursor and counts the records it lost
+when the writer lapped it.
+"""
+import fcntl
+import os
+import numpy as np
+
+from .datahandler import RECORD_DTYPE
+
+RING_PATH = "/dev/shm/measureyes.ring"
+
+MAGIC = 0x474e4952  # b'RING'
+
+HEADER_DTYPE = np.dtype([
+    ('magic', '<u4'),
+    ('capacity', '<u4'),
+    ('head', '<u8')])
+
+
+def _map(filename, mode):
+    """Returns the header and the slots of a ring file as views"""
+    mm = np.memmap(filename, dtype=np.uint8, mode=mode)
+    header = mm[:HEADER_DTYPE.itemsize].view(HEADER_DTYPE)
+    slots = mm[HEADER_DTYPE.itemsize:].view(RECORD_DTYPE)
+    return header, slots
+
+
+def _is_ring(filename, capacity):
+    """Returns True if filename is a ring of this capacity"""
+    size = HEADER_DTYPE.itemsize + capacity * RECORD_DTYPE.itemsize
+    if not os.path.exists(filename) or os.path.getsize(filename) != size:
+        return False
+    header = np.fromfile(filename, dtype=HEADER_DTYPE, count=1)
+    return header['magic'][0] == MAGIC and header['capacity'][0] == capacity
+
+
+class RingBuffer():
+    def __init__(self, filename=RING_PATH, capacity=4096):
+        """Writer of the ring buffer.
+
+        An existing ring of the same capacity is reused, so readers keep
+        their cursors when the capture process restarts. The ring stays
+        locked until `close` or the end of the process.
+
+        Arguments:
+            filename (str): path of the ring file; /dev/shm keeps it in RAM
+            capacity (int): number of records the ring holds
+
+        Raises:
+            IOError: another writer holds the ring
+        """
+        # lock before the file is (re)created so a running writer's ring
+        # is never truncated
+        self.lock = open(filename, 'ab')
+        try:
+            fcntl.flock(self.lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            self.lock.close()
+            raise IOError(f"{filename} is already written by another "
+                          "process; give every writer its own ring")
+        if not _is_ring(filename, capacity):
+            header = np.zeros(1, dtype=HEADER_DTYPE)
+            header['magic'] = MAGIC
+            header['capacity'] = capacity
+            with open(filename, 'r+b') as f:
+                f.write(header.tobytes())
+                f.truncate(HEADER_DTYPE.itemsize
+                           + capacity * RECORD_DTYPE.itemsize)
+        self.filename = filename
+        self.capacity = capacity
+        self.header, self.slots = _map(filename, 'r+')
+
+    def write(self, records):
+        """Copies RECORD_DTYPE records into the ring and publishes them"""
+        n = len(records)
+        if n == 0:
+            return
+        head = int(self.header['head'][0])
+        # a write larger than the ring only keeps its newest records
+        records = records[-self.capacity:]
+        slots = np.arange(head + n - len(records), head + n) % self.capacity
+        self.slots[slots] = records
+        # readers only see the records once head moves past them
+        self.header['head'] = head + n
+
+    def close(self):
+        """Releases the ring for another writer"""
+        self.lock.close()
+
+
+class RingReader():
+    def __init__(self, filename=RING_PATH, from_start=False):
+        """Reader of the ring buffer with its own cursor.
+
+        Arguments:
+            filename (str): path of the ring file
+            from_start (bool): start with the oldest record still in the
+                ring instead of the next record that is written
+
+        Attributes:
+            lost (int): records the writer overwrote before they were read
+        """
+        self.header, self.slots = _map(filename, 'r')
+        self.capacity = int(self.header['capacity'][0])
+        assert self.header['magic'][0] == MAGIC, f"{filename} is not a ring"
+        head = int(self.header['head'][0])
+        self.cursor = max(0, head - self.capacity) if from_start else head
+        self.lost = 0
+
+    def read(self):
+        """Returns the records written since the last read"""
+        head = int(self.header['head'][0])
+        if head < self.cursor:
+            # the ring was created again
+            self.cursor = 0
+        start = max(self.cursor, head - self.capacity)
+        self.lost += start - self.cursor
+
+        records = self.slots[np.arange(start, head) % self.capacity]
+
+        # drop the records the writer overwrote while they were copied
+        overwritten = int(self.header['head'][0]) - self.capacity - start
+        if overwritten > 0:
+            records = records[overwritten:]
+            self.lost += overwritten
+        self.cursor = head
+        return records
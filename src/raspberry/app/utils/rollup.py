@@ -0,0 +1,209 @@
+"""Persistent rollups of the faces and persons per second.
+
+The per-second HTR of a day has 86400 rows, and every binned plot or average
+used to regroup all of them. The RollupStore keeps the sums of every bucket
+of 1 second, 1 minute, 15 minutes, 1 hour and 1 day in a small SQLite table:
+
+    resolution  ts          faces  persons  person_seconds  htr_sum
+    60          1539048780  31     58       40              21.5
+    ...
+
+`person_seconds` is the number of seconds of the bucket with persons and
+`htr_sum` the sum of their faces / persons, so the average HTR of any range
+is sum(htr_sum) / sum(person_seconds). Seconds are added incrementally; a
+second that is added again replaces its old values in every resolution, so
+the seconds that may still change can be added on every update. Queries read
+the coarsest buckets that fit the range.
+"""
+import sqlite3
+import numpy as np
+import pandas as pd
+
+# bucket sizes in seconds, finest first
+RESOLUTIONS = [1, 60, 900, 3600, 86400]
+SUMS = ['faces', 'persons', 'person_seconds', 'htr_sum']
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS rollup (
+    resolution INTEGER NOT NULL,
+    ts INTEGER NOT NULL,
+    faces INTEGER NOT NULL,
+    persons INTEGER NOT NULL,
+    person_seconds INTEGER NOT NULL,
+    htr_sum REAL NOT NULL,
+    PRIMARY KEY (resolution, ts)
+) WITHOUT ROWID;
+"""
+
+# adds the deltas of a bucket to its sums
+UPSERT = """
+INSERT INTO rollup (resolution, ts, faces, persons, person_seconds, htr_sum)
+VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT (resolution, ts) DO UPDATE SET
+    faces = faces + excluded.faces,
+    persons = persons + excluded.persons,
+    person_seconds = person_seconds + excluded.person_seconds,
+    htr_sum = htr_sum + excluded.htr_sum
+"""
+
+
+def to_seconds(bin_time_by):
+    """Returns the seconds of a pandas frequency string such as '15Min'"""
+    return int(pd.to_timedelta(bin_time_by).total_seconds())
+
+
+def second_sums(htr_df):
+    """Returns the sums of every second of a per-second HTR frame"""
+    ts = htr_df['ts'].values.astype(np.int64)
+    faces = htr_df['faces'].values.astype(np.int64)
+    persons = htr_df['persons'].values.astype(np.int64)
+    with_persons = persons > 0
+    ratio = np.zeros(len(ts))
+    ratio[with_persons] = faces[with_persons] / persons[with_persons]
+    return pd.DataFrame(data={
+        'ts': ts,
+        'faces': faces,
+        'persons': persons,
+        'person_seconds': with_persons.astype(np.int64),
+        'htr_sum': ratio})
+
+
+class RollupStore():
+    def __init__(self, filename=":memory:"):
+        """Faces and persons sums at every resolution of RESOLUTIONS.
+
+        Arguments:
+            filename (str): path to the SQLite file; ':memory:' keeps the
+                rollups for the lifetime of the object only
+        """
+        self.filename = filename
+        self.conn = sqlite3.connect(filename, check_same_thread=False)
+        if filename != ":memory:":
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def add(self, htr_df):
+        """Adds or replaces seconds in every resolution
+
+        Arguments:
+            htr_df (df): 'ts' in unix seconds, 'faces' and 'persons', as
+                DataReader.get_htr_data(time_format="unix") returns
+        """
+        if htr_df.shape[0] == 0:
+            return
+        new = second_sums(htr_df).drop_duplicates('ts', keep='last')
+        old = self.query(new['ts'].min(), new['ts'].max())
+        old = old.set_index('ts').reindex(new['ts'], fill_value=0)
+        delta = new.copy()
+        for column in SUMS:
+            delta[column] = new[column].values - old[column].values
+
+        rows = []
+        for resolution in RESOLUTIONS:
+            buckets = delta.groupby(
+                delta['ts'] // resolution * resolution)[SUMS].sum()
+            rows.extend((resolution, int(ts), int(faces), int(persons),
+                         int(person_seconds), float(htr_sum))
+                        for (ts, faces, persons, person_seconds, htr_sum)
+                        in buckets.itertuples())
+        with self.conn:
+            self.conn.executemany(UPSERT, rows)
+
+    def query(self, start=None, end=None, resolution=1):
+        """Returns the buckets of a resolution that start in [start, end]
+        """
+        sql = ("SELECT ts, faces, persons, person_seconds, htr_sum "
+               "FROM rollup WHERE resolution = ?")
+        params = [resolution]
+        if start is not None:
+            sql += " AND ts >= ?"
+            params.append(int(start))
+        if end is not None:
+            sql += " AND ts <= ?"
+            params.append(int(end))
+        sql += " ORDER BY ts"
+        return pd.read_sql_query(sql, self.conn, params=params)
+
+    def timeframe(self):
+        """Returns the first and the last second of the store"""
+        return self.conn.execute(
+            "SELECT MIN(ts), MAX(ts) FROM rollup WHERE resolution = 1"
+        ).fetchone()
+
+    def level_for(self, seconds):
+        """Returns the coarsest resolution whose buckets tile `seconds`"""
+        return max(resolution for resolution in RESOLUTIONS
+                   if seconds % resolution == 0)
+
+    def binned(self, seconds, start=None, end=None):
+        """Returns the faces and persons of every `seconds` long bin from
+        the bin of `start` to the bin of `end`, empty bins included
+
+        The bins are read from the coarsest resolution that tiles them.
+        """
+        resolution = self.level_for(seconds)
+        if start is not None:
+            start = int(start) // seconds * seconds
+        if end is not None:
+            end = int(end)
+        buckets = self.query(start, end, resolution)
+        if buckets.shape[0] == 0:
+            return pd.DataFrame(columns=['ts', 'faces', 'persons'],
+                                dtype=np.int64)
+        bins = buckets.groupby(buckets['ts'] // seconds * seconds)[
+            ['faces', 'persons']].sum()
+        first = bins.index[0] if start is None else start
+        last = bins.index[-1] if end is None else end // seconds * seconds
+        x_axis_ts = np.arange(first, last + 1, seconds)
+        bins = bins.reindex(x_axis_ts, fill_value=0)
+        return bins.rename_axis('ts').reset_index()
+
+    def sums(self, start=None, end=None):
+        """Returns the totals of SUMS over the seconds in [start, end]
+
+        The range is covered by the largest whole buckets that fit in it,
+        so a day is one row and its edges a few more.
+        """
+        (first, last) = self.timeframe()
+        if first is None:
+            return dict.fromkeys(SUMS, 0)
+        start = first if start is None else max(int(start), first)
+        end = last if end is None else min(int(end), last)
+
+        totals = dict.fromkeys(SUMS, 0)
+        uncovered = [(start, end)] if start <= end else []
+        for resolution in reversed(RESOLUTIONS):
+            remaining = []
+            for (a, b) in uncovered:
+                # whole buckets inside [a, b]
+                full_start = -(-a // resolution) * resolution
+                full_end = (b + 1) // resolution * resolution - 1
+                if full_start > full_end:
+                    remaining.append((a, b))
+                    continue
+                row = self.conn.execute(
+                    "SELECT SUM(faces), SUM(persons), SUM(person_seconds), "
+                    "SUM(htr_sum) FROM rollup WHERE resolution = ? "
+                    "AND ts >= ? AND ts <= ?",
+                    (resolution, full_start, full_end - resolution + 1)
+                ).fetchone()
+                for column, value in zip(SUMS, row):
+                    totals[column] += value or 0
+                if a < full_start:
+                    remaining.append((a, full_start - 1))
+                if full_end < b:
+                    remaining.append((full_end + 1, b))
+            uncovered = remaining
+        return totals
+
+    def avg_htr(self, start=None, end=None):
+        """Returns the mean faces / persons over the seconds with persons in
+        [start, end]"""
+        totals = self.sums(start, end)
+        if totals['person_seconds'] == 0:
+            return np.nan
+        return totals['htr_sum'] / totals['person_seconds']
@@ -0,0 +1,61 @@
+"""Class object that decides when a capture loop should stop.
+
+A loop stops when a signal (Ctrl-C, `kill`) arrives, when the duration limit
+has passed or when the frame limit is reached. Without a display there is no
+'q' key, so this is how headless units are shut down cleanly.
+"""
+import signal
+import threading
+import time
+
+
+class RunControl():
+    def __init__(self, duration=None, max_frames=None,
+                 signals=(signal.SIGINT, signal.SIGTERM)):
+        """Tracks the stop conditions of a capture loop.
+
+        Arguments:
+            duration (float): seconds to run for; None runs until stopped
+            max_frames (int): frames to process; None runs until stopped
+            signals (tuple): signals that request a clean shutdown
+        """
+        self.duration = duration
+        self.max_frames = max_frames
+        self.signals = signals
+        self.frames = 0
+        self.start_time = None
+        self._stop = threading.Event()
+
+    def start(self):
+        """Starts the clock and installs the signal handlers.
+
+        Signal handlers can only be installed from the main thread.
+        """
+        self.start_time = time.time()
+        if threading.current_thread() is threading.main_thread():
+            for signum in self.signals:
+                signal.signal(signum, self.handle_signal)
+        return self
+
+    def handle_signal(self, signum, frame):
+        print(f"[INFO] received signal {signum}, shutting down...")
+        self.stop()
+
+    def stop(self):
+        """Requests the loop to stop after the current frame"""
+        self._stop.set()
+
+    def tick(self):
+        """Counts one processed frame"""
+        self.frames += 1
+
+    def should_stop(self):
+        """Returns True once any stop condition is met"""
+        if self._stop.is_set():
+            return True
+        if self.max_frames is not None and self.frames >= self.max_frames:
+            return True
+        if (self.duration is not None and self.start_time is not None and
+                time.time() - self.start_time >= self.duration):
+            return True
+        return False
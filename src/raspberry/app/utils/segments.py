@@ -0,0 +1,86 @@
+"""Functions for the rotated segment files of a DataHandler session.
+
+With rotation a session is written to a series of segment files instead of
+one file that grows forever. A small json manifest next to the segments maps
+each of them to the time range of its rows:
+
+    {"measure": "faces", "session": 1539048822, "method": "csv",
+     "segments": [{"filename": "faces_1539048822_1539048822.csv.gz",
+                   "start": 1539048822, "end": 1539051599, "rows": 5120},
+                  {"filename": "faces_1539048822_1539051600.csv",
+                   "start": 1539051600, "end": 1539052210, "rows": 9800},
+                  {"filename": "faces_1539048822_1539052211.csv",
+                   "start": 1539052211, "end": null, "rows": 12}]}
+
+The segment that is still being written has no end. A segment started by
+the clock starts on its boundary and one started by the size limit at the
+ts of its first row; a second segment that starts in the same second gets
+a `_1`, `_2`, ... suffix, so no two segments share a file. Readers only open
+the segments that overlap the window they need.
+"""
+import gzip
+import json
+import os
+import shutil
+
+
+def manifest_filename(path, measure, session):
+    """Returns the manifest file of a session"""
+    return f'{path}/{measure}_{session}.manifest.json'
+
+
+def segment_filename(path, measure, session, segment_start, extension,
+                     part=0):
+    """Returns the file of the segment that starts at `segment_start`; the
+    `part`-th later segment with the same start gets a `_<part>` suffix"""
+    if part:
+        return (f'{path}/{measure}_{session}_{segment_start}_{part}'
+                f'.{extension}')
+    return f'{path}/{measure}_{session}_{segment_start}.{extension}'
+
+
+def load_manifest(filename):
+    with open(filename) as f:
+        return json.load(f)
+
+
+def save_manifest(filename, manifest):
+    """Replaces the manifest atomically so readers never see half of it"""
+    tmp = filename + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, filename)
+
+
+def compress_file(filename):
+    """Gzips a closed segment and returns the name of the compressed file
+
+    The original is only removed by the caller, after the manifest points
+    to the compressed file.
+    """
+    compressed = filename + '.gz'
+    with open(filename, 'rb') as f_in:
+        with gzip.open(compressed, 'wb') as f_out:
+            shutil.copyfileobj(f_in, f_out)
+    return compressed
+
+
+def segments_in_range(manifest_file, start=None, end=None):
+    """Returns the paths of the segments that overlap [start, end]
+
+    Arguments:
+        manifest_file (str): path to a manifest written by DataHandler
+        start (int): first ts of the window; None reads from the beginning
+        end (int): last ts of the window; None reads to the end
+    """
+    manifest = load_manifest(manifest_file)
+    directory = os.path.dirname(manifest_file)
+    paths = []
+    for segment in manifest['segments']:
+        if end is not None and segment['start'] > end:
+            continue
+        if (start is not None and segment['end'] is not None
+                and segment['end'] < start):
+            continue
+        paths.append(os.path.join(directory, segment['filename']))
+    return paths
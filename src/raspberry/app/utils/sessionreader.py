@@ -0,0 +1,205 @@
+"""Reader of many recorded sessions of one or more cameras.
+
+Every session leaves a faces and a persons file (or manifest) named after its
+start time, and every unit writes into its own directory, e.g.
+
+    ../data/output/window/faces_1539048822.csv
+    ../data/output/window/persons_1539048822.csv
+    ../data/output/door/faces_1539049000.manifest.json
+    ...
+
+The name of the directory of a session is its camera ID. The SessionReader
+finds the sessions of a directory, glob or manifest, parses them in a process
+pool down to per-second id counts and merges them into one HTR series per
+camera, e.g. to compare two displays.
+"""
+from glob import glob
+from multiprocessing import Pool
+import os
+import re
+import numpy as np
+import pandas as pd
+
+from .datareader import (CHUNKSIZE, count_ids, load_records, load_segments,
+                         read_counts, to_timeofday)
+
+MEASURES = ['faces', 'persons']
+SESSION_FILE = re.compile(
+    r'^(faces|persons)_(\d+)(\.csv|\.bin|\.manifest\.json)$')
+
+
+def output_path(camera=None, root="../data/output"):
+    """Returns the directory the sessions of a camera are written to and
+    creates it; without a camera it is `root` itself"""
+    if camera is None:
+        return root
+    path = os.path.join(root, camera)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def find_sessions(source, camera=None):
+    """Returns the sessions with a faces and a persons file
+
+    Arguments:
+        source (str): directory (searched recursively), glob pattern or
+            path to a file or manifest of a session; the files of the other
+            measure are found next to it
+        camera (str or list): only keep the sessions of these cameras
+
+    Returns:
+        list of dicts with 'camera', 'session', 'faces' and 'persons',
+        sorted by camera and session
+    """
+    if os.path.isdir(source):
+        paths = glob(os.path.join(source, '**', '*'), recursive=True)
+    else:
+        paths = glob(source)
+    if isinstance(camera, str):
+        camera = [camera]
+
+    sessions = {}
+    for path in paths:
+        match = SESSION_FILE.match(os.path.basename(path))
+        if match is None:
+            continue
+        (_, session, extension) = match.groups()
+        directory = os.path.dirname(os.path.abspath(path))
+        name = os.path.basename(directory)
+        if camera is not None and name not in camera:
+            continue
+        files = {measure: os.path.join(
+            directory, f'{measure}_{session}{extension}')
+            for measure in MEASURES}
+        if all(os.path.exists(f) for f in files.values()):
+            sessions[(name, int(session), extension)] = files
+
+    return [dict(camera=name, session=session, **files)
+            for ((name, session, _), files) in sorted(sessions.items())]
+
+
+def read_session_counts(filename, start=None, end=None, chunksize=CHUNKSIZE):
+    """Returns the distinct ids of every second in [start, end] of a csv,
+    bin or manifest file as a Series indexed by ts"""
+    if filename.endswith('.manifest.json'):
+        counts = count_ids(load_segments(filename, start, end))
+    elif filename.endswith('.bin'):
+        counts = count_ids(load_records(filename))
+    else:
+        counts = read_counts(filename, chunksize)
+    if start is not None:
+        counts = counts[counts.index >= start]
+    if end is not None:
+        counts = counts[counts.index <= end]
+    return counts
+
+
+def count_session(job):
+    """Returns the face and person counts of one session; runs in a worker
+    """
+    return tuple(read_session_counts(job['session'][measure], job['start'],
+                                     job['end'], job['chunksize'])
+                 for measure in MEASURES)
+
+
+class SessionReader():
+    def __init__(self, source, time_range=None, camera=None, processes=None,
+                 chunksize=CHUNKSIZE):
+        """Reads the sessions of one or more cameras into per-second counts.
+
+        Arguments:
+            source (str): directory, glob pattern or session file/manifest,
+                see find_sessions
+            time_range (tuple): (start, end) ts to read; either can be None
+            camera (str or list): only read the sessions of these cameras
+            processes (int): number of worker processes; defaults to all
+                cores, 1 parses in this process
+            chunksize (int): rows of a csv file parsed at a time
+
+        Attributes:
+            sessions (list): the sessions that were read, see find_sessions
+            counts (dict): (face counts, person counts) of every camera
+        """
+        (self.start, self.end) = time_range if time_range else (None, None)
+        self.sessions = find_sessions(source, camera)
+        # a session that starts after the window has no rows in it
+        if self.end is not None:
+            self.sessions = [session for session in self.sessions
+                             if session['session'] <= self.end]
+        if processes is None:
+            processes = os.cpu_count()
+
+        jobs = [{'session': session, 'start': self.start, 'end': self.end,
+                 'chunksize': chunksize} for session in self.sessions]
+        if processes == 1 or len(jobs) < 2:
+            results = [count_session(job) for job in jobs]
+        else:
+            with Pool(min(processes, len(jobs))) as pool:
+                results = pool.map(count_session, jobs)
+
+        self.counts = {}
+        for session, session_counts in zip(self.sessions, results):
+            name = session['camera']
+            if name in self.counts:
+                session_counts = tuple(
+                    old.add(new, fill_value=0).astype(np.int64)
+                    for (old, new) in zip(self.counts[name], session_counts))
+            self.counts[name] = session_counts
+
+    @property
+    def cameras(self):
+        return sorted(self.counts)
+
+    def get_timeframe(self):
+        """Returns every ts from the first to the last second with rows"""
+        indexes = [counts.index for pair in self.counts.values()
+                   for counts in pair if len(counts)]
+        if not indexes:
+            return np.arange(0)
+        return np.arange(min(index.min() for index in indexes),
+                         max(index.max() for index in indexes) + 1)
+
+    def get_htr_data(self, time_format=None, by_camera=False):
+        """Returns the faces and persons of every second of the timeframe
+
+        Arguments:
+            time_format (str): "unix" for ts in the 'ts' column, otherwise
+                the time of day
+            by_camera (bool): one row per camera and second with a 'camera'
+                column instead of the sums over the cameras
+        """
+        x_axis_ts = self.get_timeframe()
+        frames = []
+        for name in self.cameras:
+            (faces, persons) = (
+                counts.reindex(x_axis_ts, fill_value=0).values
+                for counts in self.counts[name])
+            frames.append(pd.DataFrame(data={
+                'camera': name,
+                'ts': x_axis_ts,
+                # there cannot be more faces than persons in a second
+                'faces': np.minimum(faces, persons).astype(np.int64),
+                'persons': persons.astype(np.int64)}))
+        if frames:
+            htr_df = pd.concat(frames, ignore_index=True)
+        else:
+            htr_df = pd.DataFrame(columns=['camera', 'ts', 'faces',
+                                           'persons'], dtype=np.int64)
+
+        if not by_camera:
+            htr_df = htr_df.groupby('ts', sort=True)[['faces', 'persons']] \
+                .sum().reindex(x_axis_ts, fill_value=0) \
+                .rename_axis('ts').reset_index()
+        if time_format != "unix":
+            htr_df['ts'] = to_timeofday(htr_df['ts']).tolist()
+        return htr_df
+
+    def get_avg_htr(self, by_camera=False):
+        """Returns the mean faces / persons over the seconds with persons,
+        per camera as a Series with by_camera"""
+        htr = self.get_htr_data("unix", by_camera=by_camera)
+        htr = htr[htr['persons'] > 0]
+        ratio = htr['faces'] / htr['persons']
+        if by_camera:
+            return ratio.groupby(htr['camera']).mean()
+        return ratio.mean()
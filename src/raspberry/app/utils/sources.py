@@ -0,0 +1,82 @@
+"""Deterministic frame sources that stand in for the webcam.
+
+Both sources have the `read()` interface of cv2.VideoCapture and end after a
+fixed number of frames, so runs of the pipeline can be repeated and compared
+without a camera attached.
+"""
+import numpy as np
+import cv2
+
+
+class SyntheticSource():
+    def __init__(self, n_frames, width=640, height=480, pool=30, seed=0):
+        """Generates frames with a few moving boxes on a noisy background.
+
+        The frames are generated up front and cycled, so generating them
+        is not part of what is measured.
+
+        Arguments:
+            n_frames (int): number of frames before the source ends
+            width (int): frame width
+            height (int): frame height
+            pool (int): number of distinct frames that are cycled
+            seed (int): seed of the random background and boxes
+        """
+        self.n_frames = n_frames
+        self.read_frames = 0
+        rng = np.random.RandomState(seed)
+        background = rng.randint(0, 64, size=(height, width, 3),
+                                 dtype=np.uint8)
+        boxes = rng.randint(0, min(width, height) // 2, size=(3, 2))
+        colors = rng.randint(64, 256, size=(3, 3))
+
+        self.frames = []
+        for i in range(pool):
+            frame = background.copy()
+            for (x, y), color in zip(boxes, colors):
+                x = (x + 8 * i) % (width - width // 6)
+                cv2.rectangle(frame, (int(x), int(y)),
+                              (int(x) + width // 6, int(y) + height // 3),
+                              tuple(int(c) for c in color), -1)
+            self.frames.append(frame)
+
+    def read(self):
+        if self.read_frames >= self.n_frames:
+            return (False, None)
+        frame = self.frames[self.read_frames % len(self.frames)]
+        self.read_frames += 1
+        return (True, frame)
+
+    def release(self):
+        pass
+
+
+class LoopedVideoSource():
+    def __init__(self, filename, n_frames):
+        """Reads a video file from the start again until n_frames were read.
+
+        Arguments:
+            filename (str): path to the video file
+            n_frames (int): number of frames before the source ends
+        """
+        self.vs = cv2.VideoCapture(filename)
+        if not self.vs.isOpened():
+            raise IOError(f"cannot open video file {filename}")
+        self.n_frames = n_frames
+        self.read_frames = 0
+
+    def read(self):
+        if self.read_frames >= self.n_frames:
+            return (False, None)
+        (grabbed, frame) = self.vs.read()
+        if not grabbed:
+            # rewind at the end of the file
+            self.vs.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            (grabbed, frame) = self.vs.read()
+            if not grabbed:
+                return (False, None)
+        self.read_frames += 1
+        return (True, frame)
+
+    def release(self):
+        self.vs.release()
@@ -0,0 +1,157 @@
+"""Functions to record and query detections in an embedded SQLite database.
+
+Faces and persons of every session share one table and one database file.
+The database runs in WAL mode so readers never block the writer, rows are
+inserted with `executemany` inside one transaction per commit, and the
+(measure, ts) index turns a time-range query into an index range scan.
+"""
+import sqlite3
+import numpy as np
+import pandas as pd
+
+from .postprocess import pad_row
+
+DB_NAME = "measureyes.db"
+
+COLUMNS = ['ts', 'label', 'id', 'confidence', 'startX', 'startY', 'endX',
+           'endY', 'frame', 'ns', 'seen', 'frames', 'max_simultaneous']
+
+# columns added after the first release; older databases get them with
+# the values of a per-frame row
+COUNT_COLUMNS = ['seen', 'frames', 'max_simultaneous']
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS detections (
+    session INTEGER NOT NULL,
+    measure TEXT NOT NULL,
+    ts INTEGER NOT NULL,
+    label TEXT NOT NULL,
+    id INTEGER NOT NULL,
+    confidence REAL NOT NULL,
+    startX INTEGER NOT NULL,
+    startY INTEGER NOT NULL,
+    endX INTEGER NOT NULL,
+    endY INTEGER NOT NULL,
+    frame INTEGER NOT NULL,
+    ns INTEGER NOT NULL,
+    seen INTEGER NOT NULL DEFAULT 1,
+    frames INTEGER NOT NULL DEFAULT 1,
+    max_simultaneous INTEGER NOT NULL DEFAULT 1
+);
+CREATE INDEX IF NOT EXISTS detections_measure_ts
+    ON detections (measure, ts);
+"""
+
+INSERT = """
+INSERT INTO detections (session, measure, ts, label, id, confidence,
+                        startX, startY, endX, endY, frame, ns, seen,
+                        frames, max_simultaneous)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+
+def connect(filename):
+    """Opens the database in WAL mode and creates the schema if needed"""
+    conn = sqlite3.connect(filename, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    # WAL keeps the database consistent; NORMAL only syncs on checkpoints
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    existing = [row[1] for row in
+                conn.execute("PRAGMA table_info(detections)").fetchall()]
+    with conn:
+        for column in COUNT_COLUMNS:
+            if column not in existing:
+                conn.execute(f"ALTER TABLE detections ADD COLUMN {column} "
+                             "INTEGER NOT NULL DEFAULT 1")
+    return conn
+
+
+def to_rows(ts, detections, labels, frame=0, ns=0, seen=1, frames=1,
+            max_simultaneous=None):
+    """Returns the detections of one frame as (ts, label, id, confidence,
+    startX, startY, endX, endY, frame, ns, seen, frames, max_simultaneous)
+    tuples, see DataHandler.write_detections"""
+    if max_simultaneous is None:
+        max_simultaneous = len(detections)
+    seen = np.broadcast_to(seen, len(detections)).tolist()
+    return [(ts, labels[class_id], i, round(confidence, 2), startX, startY,
+             endX, endY, frame, ns, n_seen, frames, max_simultaneous)
+            for ((i, class_id, confidence, startX, startY, endX, endY),
+                 n_seen) in zip(detections.tolist(), seen)]
+
+
+def parse_row(data):
+    """Returns a csv row string as a row tuple, padded as pad_row"""
+    (ts, label, i, confidence, startX, startY, endX, endY, frame, ns, seen,
+     frames, max_simultaneous) = pad_row(data).split(',')
+    return (int(ts), label, int(i), float(confidence), int(startX),
+            int(startY), int(endX), int(endY), int(frame), int(ns),
+            int(seen), int(frames), int(max_simultaneous))
+
+
+class SQLiteWriter():
+    def __init__(self, filename, session, measure):
+        """Inserts the rows of one session and measure.
+
+        It has the write/flush/close interface of the files DataHandler
+        writes to, but `write` takes a list of row tuples.
+
+        Arguments:
+            filename (str): path to the database file
+            session (int): start time of the session
+            measure (str): 'faces' or 'persons'
+        """
+        self.filename = filename
+        self.session = session
+        self.measure = measure
+        self.conn = connect(filename)
+        self.closed = False
+
+    def write(self, rows):
+        """Inserts the rows in one transaction"""
+        with self.conn:
+            self.conn.executemany(INSERT, [
+                (self.session, self.measure) + tuple(row) for row in rows])
+
+    def flush(self):
+        # every write is already committed
+        pass
+
+    def close(self):
+        self.conn.close()
+        self.closed = True
+
+
+def query(filename, measure, start=None, end=None, session=None,
+          markers=True):
+    """Returns the rows of a measure in a time range as a DataFrame
+
+    Arguments:
+        filename (str): path to the database file
+        measure (str): 'faces' or 'persons'
+        start (int): first ts to include; None reads from the beginning
+        end (int): last ts to include; None reads to the end
+        session (int): only read one session
+        markers (bool): include the videostart and videoend rows
+    """
+    sql = f"SELECT {', '.join(COLUMNS)} FROM detections WHERE measure = ?"
+    params = [measure]
+    if start is not None:
+        sql += " AND ts >= ?"
+        params.append(int(start))
+    if end is not None:
+        sql += " AND ts <= ?"
+        params.append(int(end))
+    if session is not None:
+        sql += " AND session = ?"
+        params.append(int(session))
+    if not markers:
+        sql += " AND label NOT IN ('videostart', 'videoend')"
+    sql += " ORDER BY ts"
+
+    conn = connect(filename)
+    try:
+        return pd.read_sql_query(sql, conn, params=params)
+    finally:
+        conn.close()
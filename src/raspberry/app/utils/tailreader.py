@@ -0,0 +1,199 @@
+"""Incremental reader that follows the files a DataHandler appends to.
+
+`stream_to_dashboard.py` polls the detection files while the measure app is
+still writing them. Instead of parsing both files from byte zero on every
+poll, the TailReader remembers how far it has read, parses only the lines
+appended since and updates the per-second face and person counts and the
+average HTR in place. A partial last line stays in the file until the writer
+finishes it.
+"""
+import io
+import os
+import numpy as np
+import pandas as pd
+
+from .datahandler import RECORD_DTYPE
+from .datareader import drop_markers, records_to_frame, to_timeofday
+
+
+class FileTail():
+    def __init__(self, filename):
+        """Returns the rows appended to a csv or bin file since the last read
+
+        Arguments:
+            filename (str): path to a file written by a DataHandler
+        """
+        self.filename = filename
+        self.binary = filename.endswith('.bin')
+        self.offset = 0
+        self.header = b""
+
+    def read(self):
+        """Returns the complete rows appended since the last read as a
+        DataFrame with the csv columns"""
+        if not os.path.exists(self.filename):
+            return None
+        if os.path.getsize(self.filename) < self.offset:
+            # the file was replaced; start over
+            self.offset = 0
+            self.header = b""
+        with open(self.filename, 'rb') as f:
+            f.seek(self.offset)
+            data = f.read()
+
+        # only consume whole records or lines
+        if self.binary:
+            end = len(data) - len(data) % RECORD_DTYPE.itemsize
+        else:
+            end = data.rfind(b"\n") + 1
+        if end == 0:
+            return None
+        chunk = data[:end]
+        self.offset += end
+
+        if self.binary:
+            return records_to_frame(np.frombuffer(chunk, dtype=RECORD_DTYPE))
+        if not self.header:
+            (self.header, chunk) = chunk.split(b"\n", 1)
+            self.header += b"\n"
+        return pd.read_csv(io.BytesIO(self.header + chunk))
+
+
+class SecondCounter():
+    def __init__(self, window=60):
+        """Counts the distinct ids of every second of rows that arrive in ts
+        order.
+
+        Arguments:
+            window (int): seconds behind the newest row in which more rows
+                of a second may still arrive; their ids are remembered so
+                they are not counted twice
+        """
+        self.window = window
+        self.counts = pd.Series(dtype=np.int64)
+        self.recent = set()
+        self.last_ts = None
+
+    def add(self, df):
+        """Adds the ids of new rows to the counts of their seconds"""
+        if df is None or df.shape[0] == 0:
+            return
+        pairs = set(zip(df['ts'].tolist(), df['id'].tolist()))
+        new = pairs - self.recent
+        self.recent |= new
+
+        if new:
+            new_ts = pd.Series([ts for (ts, i) in new]).value_counts()
+            self.counts = self.counts.add(new_ts, fill_value=0).astype(
+                np.int64)
+
+        self.last_ts = max(self.last_ts or 0, int(df['ts'].max()))
+        # seconds out of the window are complete
+        self.recent = {(ts, i) for (ts, i) in self.recent
+                       if ts > self.last_ts - self.window}
+
+
+class TailReader():
+    def __init__(self, face_data, person_data, window=60):
+        """Follows a face and a person file and keeps the per-second counts
+        and the average HTR up to date.
+
+        Arguments:
+            face_data (str): path to the csv or bin file of faces
+            person_data (str): path to the csv or bin file of persons
+            window (int): seconds in which late rows of a second may arrive
+
+        Attributes:
+            avg_htr (float): mean of faces / persons over the seconds with
+                persons, as DataReader.get_avg_htr
+        """
+        self.faces = FileTail(face_data)
+        self.persons = FileTail(person_data)
+        self.face_counts = SecondCounter(window)
+        self.person_counts = SecondCounter(window)
+        self.window = window
+        self.first_ts = None
+        # running sums over the seconds that can no longer change
+        self.closed_ts = None
+        self.htr_sum = 0.0
+        self.htr_seconds = 0
+        self.avg_htr = np.nan
+
+    def update(self):
+        """Parses the new rows of both files; returns how many were read"""
+        n_rows = 0
+        for (tail, counter) in [(self.faces, self.face_counts),
+                                (self.persons, self.person_counts)]:
+            df = tail.read()
+            if df is None:
+                continue
+            df = drop_markers(df)
+            n_rows += df.shape[0]
+            if df.shape[0]:
+                first_ts = int(df['ts'].min())
+                if self.first_ts is None or first_ts < self.first_ts:
+                    self.first_ts = first_ts
+            counter.add(df)
+        self.update_avg_htr()
+        return n_rows
+
+    @property
+    def last_ts(self):
+        """ts of the newest row of either file"""
+        return max(self.face_counts.last_ts or 0,
+                   self.person_counts.last_ts or 0)
+
+    def update_avg_htr(self):
+        """Folds the seconds that left the window into the running HTR and
+        adds the open seconds on top"""
+        if self.first_ts is None:
+            return
+        start = self.first_ts if self.closed_ts is None else self.closed_ts + 1
+        closed_ts = self.last_ts - self.window
+        if closed_ts >= start:
+            (ratio_sum, seconds) = self.htr_sums(start, closed_ts)
+            self.htr_sum += ratio_sum
+            self.htr_seconds += seconds
+            self.closed_ts = closed_ts
+            start = closed_ts + 1
+
+        (ratio_sum, seconds) = self.htr_sums(start, self.last_ts)
+        seconds += self.htr_seconds
+        if seconds:
+            self.avg_htr = (self.htr_sum + ratio_sum) / seconds
+
+    def htr_sums(self, start, end):
+        """Returns the sum of faces / persons over the seconds in
+        [start, end] with persons and the number of those seconds"""
+        htr = self.get_htr_data("unix", start, end)
+        with_persons = htr[htr['persons'] > 0]
+        return ((with_persons['faces'] / with_persons['persons']).sum(),
+                with_persons.shape[0])
+
+    def get_htr_data(self, time_format=None, start=None, end=None):
+        """Returns the faces and persons of every second in [start, end]
+
+        It has the columns of DataReader.get_htr_data; seconds without rows
+        count 0 and there are never more faces than persons.
+        """
+        if start is None:
+            start = self.first_ts
+        if end is None:
+            end = self.last_ts
+        if start is None or end < start:
+            x_axis_ts = np.arange(0)
+        else:
+            x_axis_ts = np.arange(start, end + 1)
+
+        faces = self.face_counts.counts.reindex(x_axis_ts, fill_value=0)
+        persons = self.person_counts.counts.reindex(x_axis_ts, fill_value=0)
+        if time_format == "unix":
+            time_col = x_axis_ts
+        else:
+            time_col = to_timeofday(x_axis_ts).tolist()
+        htr_df = pd.DataFrame(data={
+            'ts': time_col,
+            'faces': faces.values.astype(np.int64),
+            'persons': persons.values.astype(np.int64)})
+        htr_df['faces'] = htr_df['faces'].clip(upper=htr_df['persons'])
+        return htr_df
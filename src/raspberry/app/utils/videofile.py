@@ -0,0 +1,178 @@
+"""Functions to measure a recorded video file faster than real time.
+
+The video is split into time segments that are measured in a process pool,
+one Pipeline per segment. Every segment writes its own DataHandler files
+into a scratch directory and the segments are then merged, in order, into
+one faces and one persons file. Timestamps come from the frame times of the
+video instead of the wall clock.
+"""
+from multiprocessing import Pool
+import os
+import shutil
+import tempfile
+import cv2
+
+from .datahandler import DataHandler
+from .pipeline import Pipeline
+from .runcontrol import RunControl
+
+
+class SegmentReader():
+    def __init__(self, filename, start_frame, end_frame, start_time, fps):
+        """Reads the frames [start_frame, end_frame) of a video file.
+
+        Arguments:
+            filename (str): path to the video file
+            start_frame (int): index of the first frame of the segment
+            end_frame (int): index of the first frame after the segment
+            start_time (float): unix time of the first frame of the video
+            fps (float): frame rate of the video
+        """
+        self.vs = cv2.VideoCapture(filename)
+        if start_frame > 0:
+            self.vs.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+        self.index = start_frame - 1
+        self.end_frame = end_frame
+        self.start_time = start_time
+        self.fps = fps
+
+    def read(self):
+        if self.index + 1 >= self.end_frame:
+            return (False, None)
+        (grabbed, frame) = self.vs.read()
+        if grabbed:
+            self.index += 1
+        return (grabbed, frame)
+
+    def ts(self, ns=None):
+        """Returns the ts of the frame that was read last; the video time is
+        used instead of the capture time `ns`"""
+        return int(self.start_time + self.index / self.fps)
+
+    def release(self):
+        self.vs.release()
+
+
+def video_info(filename):
+    """Returns the frame count and frame rate of a video file"""
+    vs = cv2.VideoCapture(filename)
+    if not vs.isOpened():
+        raise IOError(f"cannot open video file {filename}")
+    frame_count = int(vs.get(cv2.CAP_PROP_FRAME_COUNT))
+    fps = vs.get(cv2.CAP_PROP_FPS) or 30.0
+    vs.release()
+    return frame_count, fps
+
+
+def split_segments(frame_count, n_segments):
+    """Returns n_segments (start_frame, end_frame) ranges covering the video
+    """
+    n_segments = max(1, min(n_segments, frame_count))
+    bounds = [frame_count * i // n_segments for i in range(n_segments + 1)]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def measure_segment(job):
+    """Measures one segment in a worker process and returns its file names
+
+    Arguments:
+        job (dict): filename, start_frame, end_frame, start_time, fps,
+            detectors (list of (Detector class, *arguments)), path,
+            batch_size and max_wait
+    """
+    # the pool already uses every core; keep OpenCV from oversubscribing
+    cv2.setNumThreads(1)
+
+    detectors = [spec[0](*spec[1:]) for spec in job['detectors']]
+    reader = SegmentReader(job['filename'], job['start_frame'],
+                           job['end_frame'], job['start_time'], job['fps'])
+    segment_start = int(job['start_time'] + job['start_frame'] / job['fps'])
+    segment_end = int(job['start_time'] + job['end_frame'] / job['fps'])
+
+    handlers = []
+    for detector in detectors:
+        results = DataHandler(measure=detector.measure, path=job['path'],
+                              method='csv', start_time=segment_start)
+        results.makefile(verbose=False)
+        handlers.append(results)
+
+    control = RunControl(signals=()).start()
+    pipeline = Pipeline(reader, detectors, handlers, control,
+                        policy='block', clock=reader.ts,
+                        batch_size=job['batch_size'],
+                        max_wait=job['max_wait'],
+                        first_frame=job['start_frame'])
+    try:
+        stats = pipeline.run()
+    finally:
+        for results in handlers:
+            results.close(end_time=segment_end)
+        reader.release()
+    return [results.filename for results in handlers], stats
+
+
+def measure_video(filename, detectors, path="../data/output",
+                  start_time=None, processes=None, segments=None,
+                  batch_size=1, max_wait=0.05):
+    """Measures a video file with a process pool and merges the results
+
+    Arguments:
+        filename (str): path to the video file
+        detectors (list): (Detector class, *arguments) of each detector,
+            e.g. (FaceDetector, prototxt, model, min_confidence); the models
+            are loaded in every worker
+        path (str): path to directory for data
+        start_time (float): unix time of the first frame; defaults to the
+            modification time of the file minus the length of the video
+        processes (int): number of worker processes; defaults to all cores
+        segments (int): number of segments; defaults to `processes`
+        batch_size (int): frames stacked into one forward pass
+        max_wait (float): seconds a partial batch waits for more frames
+
+    Returns:
+        list of the merged csv file names, one per detector
+    """
+    frame_count, fps = video_info(filename)
+    if start_time is None:
+        start_time = os.path.getmtime(filename) - frame_count / fps
+    if processes is None:
+        processes = os.cpu_count()
+    if segments is None:
+        segments = processes
+
+    scratch = tempfile.mkdtemp(prefix='.segments_', dir=path)
+    jobs = [{'filename': filename,
+             'start_frame': start_frame,
+             'end_frame': end_frame,
+             'start_time': start_time,
+             'fps': fps,
+             'detectors': detectors,
+             'path': os.path.join(scratch, str(i)),
+             'batch_size': batch_size,
+             'max_wait': max_wait}
+            for i, (start_frame, end_frame)
+            in enumerate(split_segments(frame_count, segments))]
+    for job in jobs:
+        os.mkdir(job['path'])
+
+    try:
+        # imap keeps the segments in video order
+        with Pool(processes) as pool:
+            segment_files = []
+            for csvfilenames, stats in pool.imap(measure_segment, jobs):
+                segment_files.append(csvfilenames)
+                print("[INFO] segment done: {} frames at {:.2f} FPS".format(
+                    stats['processed'], stats['fps']))
+
+        merged = []
+        for i, spec in enumerate(detectors):
+            results = DataHandler(measure=spec[0].measure, path=path,
+                                  method='csv', start_time=int(start_time))
+            results.makefile()
+            for csvfilenames in segment_files:
+                results.append(csvfilenames[i])
+            results.close(end_time=int(start_time + frame_count / fps))
+            merged.append(results.filename)
+    finally:
+        shutil.rmtree(scratch)
+    return merged
@@ -5,6 +5,13 @@
 import numpy as np
 import argparse
 import cv2
+import os
+import sys
+
+# import the app's DNN options
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                "..", "app"))
+from utils import backend  # noqa: E402
 
 # construct the argument parse and parse the arguments
 ap = argparse.ArgumentParser()
@@ -16,18 +23,20 @@ ap.add_argument("-m", "--model", required=True,
 	help="path to Caffe pre-trained model")
 ap.add_argument("-c", "--confidence", type=float, default=0.5,
 	help="minimum probability to filter weak detections")
+backend.add_arguments(ap)
 args = vars(ap.parse_args())
 
 # load our serialized model from disk
 print("[INFO] loading model...")
 net = cv2.dnn.readNetFromCaffe(args["prototxt"], args["model"])
+input_size = backend.apply_arguments(net, args)
 
 # load the input image and construct an input blob for the image
-# by resizing to a fixed 300x300 pixels and then normalizing it
+# by resizing to the input size (300x300 by default) and normalizing it
 image = cv2.imread(args["image"])
 (h, w) = image.shape[:2]
-blob = cv2.dnn.blobFromImage(cv2.resize(image, (300, 300)), 1.0,
-	(300, 300), (104.0, 177.0, 123.0))
+blob = cv2.dnn.blobFromImage(cv2.resize(image, input_size), 1.0,
+	input_size, (104.0, 177.0, 123.0))
 
 # pass the blob through the network and obtain the detections and
 # predictions
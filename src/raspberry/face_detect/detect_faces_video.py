@@ -11,6 +11,13 @@ import argparse
 import imutils
 import time
 import cv2
+import os
+import sys
+
+# import the app's DNN options
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                "..", "app"))
+from utils import backend  # noqa: E402
 
 # construct the argument parse and parse the arguments
 ap = argparse.ArgumentParser()
@@ -20,11 +27,13 @@ ap.add_argument("-m", "--model", required=True,
                 help="path to Caffe pre-trained model")
 ap.add_argument("-c", "--confidence", type=float, default=0.5,
                 help="minimum probability to filter weak detections")
+backend.add_arguments(ap)
 args = vars(ap.parse_args())
 
 # load our serialized model from disk
 print("[INFO] loading model...")
 net = cv2.dnn.readNetFromCaffe(args["prototxt"], args["model"])
+input_size = backend.apply_arguments(net, args)
 
 # initialize the video stream and allow the cammera sensor to warmup
 print("[INFO] starting video stream...")
@@ -45,8 +54,8 @@ while True:
 
     # grab the frame dimensions and convert it to a blob
     (h, w) = frame.shape[:2]
-    blob = cv2.dnn.blobFromImage(cv2.resize(frame, (300, 300)), 1.0,
-                                 (300, 300), (104.0, 177.0, 123.0))
+    blob = cv2.dnn.blobFromImage(cv2.resize(frame, input_size), 1.0,
+                                 input_size, (104.0, 177.0, 123.0))
 
     # pass the blob through the network and obtain the detections and
     # predictions
@@ -12,6 +12,13 @@ import argparse
 import imutils
 import time
 import cv2
+import os
+import sys
+
+# import the app's DNN options
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                "..", "app"))
+from utils import backend  # noqa: E402
 
 # construct the argument parse and parse the arguments
 ap = argparse.ArgumentParser()
@@ -21,6 +28,7 @@ ap.add_argument("-m", "--model", required=True,
                 help="path to Caffe pre-trained model")
 ap.add_argument("-c", "--confidence", type=float, default=0.2,
                 help="minimum probability to filter weak detections")
+backend.add_arguments(ap)
 args = vars(ap.parse_args())
 
 # initialize the list of class labels MobileNet SSD was trained to
@@ -41,6 +49,7 @@ COLORS = np.random.uniform(0, 255, size=(len(CLASSES), 3))
 # load our serialized model from disk
 print("[INFO] loading model...")
 net = cv2.dnn.readNetFromCaffe(args["prototxt"], args["model"])
+input_size = backend.apply_arguments(net, args)
 
 # initialize the video stream, allow the cammera sensor to warmup,
 # and initialize the FPS counter
@@ -63,8 +72,8 @@ while True:
 
     # grab the frame dimensions and convert it to a blob
     (h, w) = frame.shape[:2]
-    blob = cv2.dnn.blobFromImage(cv2.resize(frame, (300, 300)), 0.007843,
-                                 (300, 300), 127.5)
+    blob = cv2.dnn.blobFromImage(cv2.resize(frame, input_size), 0.007843,
+                                 input_size, 127.5)
 
     # pass the blob through the network and obtain the detections and
     # predictions
@@ -0,0 +1,90 @@
+import tempfile
+import numpy as np
+import pandas as pd
+from utils.aggregate import aggregate, SecondAggregator
+from utils.datahandler import DataHandler
+from utils.datareader import load_records
+from utils.postprocess import DETECTION_DTYPE
+from utils.sqlstore import query
+
+
+def make_detections(rows):
+    detections = np.zeros(len(rows), dtype=DETECTION_DTYPE)
+    for i, (id_, confidence, startX) in enumerate(rows):
+        detections[i]['id'] = id_
+        detections[i]['class_id'] = 1
+        detections[i]['confidence'] = confidence
+        detections[i]['startX'] = startX
+    return detections
+
+
+class FakeHandler():
+    measure = 'faces'
+
+    def __init__(self):
+        self.rows = []
+        self.closed = None
+
+    def write_detections(self, ts, detections, labels, frame=0, ns=0,
+                         seen=1, frames=1, max_simultaneous=None):
+        self.rows.append((ts, detections['id'].tolist(),
+                          detections['startX'].tolist()))
+
+    def close(self, end_time=None):
+        self.closed = end_time
+
+
+def test_aggregate():
+    means, counts = aggregate(make_detections(
+        [(3, 0.5, 10), (0, 0.9, 20), (3, 0.7, 13)]))
+    assert means['id'].tolist() == [0, 3]
+    assert counts.tolist() == [1, 2]
+    assert means['startX'].tolist() == [20, 12]
+    assert np.allclose(means['confidence'], [0.9, 0.6])
+
+
+def test_second_aggregator():
+    handler = FakeHandler()
+    aggregator = SecondAggregator(handler)
+    aggregator.write_detections(10, make_detections([(0, 0.9, 10)]), None)
+    aggregator.write_detections(10, make_detections(
+        [(0, 0.9, 20), (1, 0.8, 0)]), None)
+    aggregator.write_detections(11, make_detections([]), None)
+    # nothing is written before the second is over
+    assert handler.rows == [(10, [0, 1], [15, 0])]
+    assert (aggregator.frames, aggregator.max_simultaneous) == (2, 2)
+
+    aggregator.write_detections(12, make_detections([(2, 0.6, 5)]), None)
+    aggregator.close(end_time=13)
+    assert handler.rows[1:] == [(12, [2], [5])]
+    assert handler.closed == 13
+    assert (aggregator.rows_in, aggregator.rows_out) == (4, 3)
+
+
+def test_counts_round_trip():
+    path = tempfile.mkdtemp()
+    for method in ['csv', 'bin', 'sql']:
+        handler = DataHandler(measure='faces', path=path, method=method,
+                              start_time=10)
+        handler.makefile(verbose=False)
+        aggregator = SecondAggregator(handler)
+        aggregator.write_detections(10, make_detections([(0, 0.9, 10)]),
+                                    ['face'] * 2)
+        aggregator.write_detections(10, make_detections(
+            [(0, 0.9, 20), (1, 0.8, 0)]), ['face'] * 2)
+        aggregator.write_detections(10, make_detections([]), ['face'] * 2)
+        aggregator.write_detections(11, make_detections([(2, 0.6, 5)]),
+                                    ['face'] * 2)
+        aggregator.close(end_time=12)
+
+        if method == 'csv':
+            df = pd.read_csv(handler.filename)
+        elif method == 'bin':
+            df = load_records(handler.filename)
+        else:
+            df = query(handler.filename, 'faces')
+        df = df[df['label'] == 'face']
+        assert df['id'].tolist() == [0, 1, 2]
+        assert df['seen'].tolist() == [2, 1, 1]
+        assert df['frames'].tolist() == [3, 3, 1]
+        assert df['max_simultaneous'].tolist() == [2, 2, 1]
@@ -0,0 +1,74 @@
+import argparse
+import json
+import os
+import cv2
+from utils.backend import (select_backend, cache_filename, cache_key,
+                           threads_key, add_arguments, apply_arguments)
+
+PROTOTXT = """name: "tiny"
+input: "data"
+input_shape { dim: 1 dim: 3 dim: 32 dim: 32 }
+layer {
+  name: "pool"
+  type: "Pooling"
+  bottom: "data"
+  top: "pool"
+  pooling_param { pool: MAX kernel_size: 2 stride: 2 }
+}
+"""
+
+
+def test_select_backend(tmpdir):
+    prototxt = os.path.join(str(tmpdir), 'tiny.prototxt')
+    with open(prototxt, 'w') as f:
+        f.write(PROTOTXT)
+    net = cv2.dnn.readNetFromCaffe(prototxt)
+    cache_dir = os.path.join(str(tmpdir), 'cache')
+
+    choice = select_backend(net, prototxt, (32, 32), cache_dir=cache_dir)
+    assert choice['target'] == 'cpu'
+
+    # later starts read the per-host cache instead of calibrating
+    filename = cache_filename(cache_dir)
+    with open(filename) as f:
+        cache = json.load(f)
+    key = cache_key(prototxt, (32, 32))
+    assert cache[key] == choice
+    cache[key]['ms'] = -1
+    with open(filename, 'w') as f:
+        json.dump(cache, f)
+    assert select_backend(net, prototxt, (32, 32),
+                          cache_dir=cache_dir)['ms'] == -1
+
+
+def test_threads_per_host(tmpdir):
+    cache_dir = os.path.join(str(tmpdir), 'cache')
+    filename = cache_filename(cache_dir)
+    os.makedirs(cache_dir)
+    # another model already picked the thread count of this host
+    with open(filename, 'w') as f:
+        json.dump({threads_key(): 1}, f)
+
+    choices = []
+    for name in ['a.prototxt', 'b.prototxt']:
+        prototxt = os.path.join(str(tmpdir), name)
+        with open(prototxt, 'w') as f:
+            f.write(PROTOTXT)
+        net = cv2.dnn.readNetFromCaffe(prototxt)
+        choices.append(select_backend(net, prototxt, (32, 32),
+                                      cache_dir=cache_dir))
+    # every model runs with the thread count of the process
+    assert [choice['threads'] for choice in choices] == [1, 1]
+    assert cv2.getNumThreads() == 1
+
+
+def test_script_arguments(tmpdir):
+    prototxt = os.path.join(str(tmpdir), 'tiny.prototxt')
+    with open(prototxt, 'w') as f:
+        f.write(PROTOTXT)
+    ap = argparse.ArgumentParser()
+    add_arguments(ap)
+    args = vars(ap.parse_args(['-b', 'opencv', '-j', '1', '-r', '32']))
+    net = cv2.dnn.readNetFromCaffe(prototxt)
+    assert apply_arguments(net, args) == (32, 32)
+    assert cv2.getNumThreads() == 1
@@ -0,0 +1,30 @@
+import numpy as np
+import benchmark
+from utils.postprocess import DETECTION_DTYPE
+from utils.sources import SyntheticSource
+
+
+class FakeDetector():
+    measure = 'persons'
+    labels = ['background', 'person']
+    input_size = (300, 300)
+
+    def detect_batch(self, frames, resized_frames, context=None):
+        return [np.zeros(2, dtype=DETECTION_DTYPE) for frame in frames]
+
+
+def test_synthetic_source():
+    first = SyntheticSource(3, seed=1)
+    second = SyntheticSource(3, seed=1)
+    for i in range(3):
+        assert np.array_equal(first.read()[1], second.read()[1])
+    assert first.read() == (False, None)
+
+
+def test_run_trial():
+    report = benchmark.run_trial('persons', [FakeDetector()], 'synthetic',
+                                 50)
+    assert report['frames'] == 50
+    assert report['dropped'] == 0
+    latency = report['latency_ms']
+    assert latency['p50'] <= latency['p95'] <= latency['p99']
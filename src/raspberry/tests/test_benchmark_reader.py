@@ -0,0 +1,15 @@
+import benchmark_reader
+
+
+def test_make_raw_data():
+    raw_df = benchmark_reader.make_raw_data(0.01, 'face', fps=8)
+    assert raw_df['frame'].max() < 0.01 * 3600 * 8
+    assert (raw_df['id'] < 4).all()
+    assert raw_df['ts'].is_monotonic_increasing
+
+
+def test_compare():
+    # compare checks that both implementations give the same output
+    report = benchmark_reader.compare(0.05)
+    assert [trial['name'] for trial in report['trials']] == \
+        ['process_data', 'ts_to_timeofday', 'get_htr_data']
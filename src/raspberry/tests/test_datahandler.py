@@ -1,5 +1,15 @@
+import os
+import tempfile
+import time
 import unittest as unittest
-from utils.datahandler import DataHandler
+import numpy as np
+import pandas as pd
+from utils.datahandler import DataHandler, read_records
+from utils.datareader import load_records, load_segments
+from utils.segments import load_manifest, segments_in_range
+from utils.sqlstore import query
+from utils.postprocess import DETECTION_DTYPE
+from utils.detectors import CLASSES
 
 
 class Test(unittest.TestCase):
@@ -9,6 +19,182 @@ class Test(unittest.TestCase):
                               method='csv')
         assert results.method == "csv"
 
+    def test_buffered(self):
+        path = tempfile.mkdtemp()
+        results = DataHandler(measure="faces", path=path, method='csv',
+                              start_time=1539048822, buffered=True,
+                              max_rows=10, max_delay=60)
+        results.makefile(verbose=False)
+        detections = np.zeros(3, dtype=DETECTION_DTYPE)
+        results.write_detections(1539048823, detections, ['face'])
+
+        # nothing is committed before a threshold is reached
+        with open(results.csvfilename) as f:
+            assert len(f.readlines()) == 2
+
+        for i in range(3):
+            results.write_detections(1539048824, detections, ['face'])
+        time.sleep(0.5)
+        with open(results.csvfilename) as f:
+            assert len(f.readlines()) == 2 + 12
+
+        # close drains the buffer before the videoend row
+        results.write_detections(1539048825, detections, ['face'])
+        results.close(end_time=1539048826)
+        with open(results.csvfilename) as f:
+            lines = f.readlines()
+        assert len(lines) == 2 + 15 + 1
+        assert lines[-1].startswith('1539048826,videoend')
+        os.remove(results.csvfilename)
+
+    def test_bin(self):
+        path = tempfile.mkdtemp()
+        results = DataHandler(measure="persons", path=path, method='bin',
+                              start_time=1539048822)
+        results.makefile(verbose=False)
+        detections = np.zeros(2, dtype=DETECTION_DTYPE)
+        detections['id'] = [0, 3]
+        detections['class_id'] = 15
+        detections['confidence'] = 0.75
+        detections['endX'] = 399
+        results.write_detections(1539048823, detections, CLASSES)
+        results.close(end_time=1539048824)
+
+        records = read_records(results.filename)
+        assert records.dtype.itemsize == 41
+        assert records['ts'].tolist() == [1539048822, 1539048823,
+                                          1539048823, 1539048824]
+
+        df = load_records(results.filename)
+        assert df['label'].tolist() == ['videostart', 'person', 'person',
+                                        'videoend']
+        assert df['id'].tolist() == [0, 0, 3, 0]
+        assert df['endX'].iloc[1] == 399
+        assert abs(df['confidence'].iloc[1] - 0.75) < 1e-6
+        os.remove(results.filename)
+
+    def test_sql(self):
+        path = tempfile.mkdtemp()
+        faces = DataHandler(measure="faces", path=path, method='sql',
+                            start_time=1539048822, buffered=True)
+        persons = DataHandler(measure="persons", path=path, method='sql',
+                              start_time=1539048822)
+        faces.makefile(verbose=False)
+        persons.makefile(verbose=False)
+        assert faces.filename == persons.filename
+
+        detections = np.zeros(2, dtype=DETECTION_DTYPE)
+        detections['id'] = [0, 1]
+        detections['confidence'] = 0.75
+        for ts in range(1539048823, 1539048830):
+            faces.write_detections(ts, detections, ['face'])
+        persons.write("1539048825,person,0,0.9,1,2,3,4")
+        faces.close(end_time=1539048830)
+        persons.close(end_time=1539048830)
+
+        df = query(faces.filename, 'faces')
+        assert df['label'].tolist() == (['videostart'] + ['face'] * 14
+                                        + ['videoend'])
+        df = query(faces.filename, 'faces', 1539048825, 1539048826,
+                   markers=False)
+        assert df['ts'].tolist() == [1539048825] * 2 + [1539048826] * 2
+        assert df['id'].tolist() == [0, 1, 0, 1]
+        df = query(persons.filename, 'persons', markers=False)
+        assert df.iloc[0].tolist() == [1539048825, 'person', 0, 0.9,
+                                       1, 2, 3, 4, 0, 0, 1, 1, 1]
+
+    def test_rotate(self):
+        path = tempfile.mkdtemp()
+        results = DataHandler(measure="faces", path=path, method='csv',
+                              start_time=1539048000, rotate=600,
+                              compress=True)
+        results.makefile(verbose=False)
+        detections = np.zeros(1, dtype=DETECTION_DTYPE)
+        for ts in range(1539048000, 1539049800, 60):
+            results.write_detections(ts, detections, ['face'])
+        results.close(end_time=1539049800)
+
+        manifest = load_manifest(results.manifest_file)
+        assert [(segment['start'], segment['end'], segment['rows'])
+                for segment in manifest['segments']] == [
+            (1539048000, 1539048540, 10),
+            (1539048600, 1539049140, 10),
+            (1539049200, 1539049800, 10)]
+        assert sorted(os.listdir(path)) == sorted(
+            [segment['filename'] for segment in manifest['segments']]
+            + ['faces_1539048000.manifest.json'])
+        assert manifest['segments'][0]['filename'].endswith('.csv.gz')
+
+        assert len(segments_in_range(results.manifest_file, 1539048700,
+                                     1539048800)) == 1
+        df = load_segments(results.manifest_file, 1539048500, 1539049300)
+        assert df['ts'].tolist() == list(range(1539048540, 1539049320, 60))
+
+        df = load_segments(results.manifest_file)
+        assert df['label'].tolist() == (['videostart'] + ['face'] * 30
+                                        + ['videoend'])
+
+    def test_rotate_bin_by_size(self):
+        path = tempfile.mkdtemp()
+        results = DataHandler(measure="persons", path=path, method='bin',
+                              start_time=1539048000, max_bytes=100)
+        results.makefile(verbose=False)
+        detections = np.zeros(2, dtype=DETECTION_DTYPE)
+        detections['class_id'] = 15
+        for ts in range(1539048001, 1539048011):
+            results.write_detections(ts, detections, CLASSES)
+        results.close(end_time=1539048011)
+
+        manifest = load_manifest(results.manifest_file)
+        assert len(manifest['segments']) > 1
+        assert sum(segment['rows'] for segment in manifest['segments']) == 20
+        df = load_segments(results.manifest_file)
+        assert (df['label'] == 'person').sum() == 20
+
+    def test_rotate_by_clock_and_size(self):
+        path = tempfile.mkdtemp()
+        results = DataHandler(measure="persons", path=path, method='csv',
+                              start_time=3600, rotate=3600, max_bytes=200,
+                              compress=True)
+        results.makefile(verbose=False)
+        detections = np.zeros(1, dtype=DETECTION_DTYPE)
+        detections['class_id'] = 15
+        # several size rotations per second and per clock period
+        for ts in [3601] * 5 + list(range(3602, 3700)) + [7200] * 3:
+            results.write_detections(ts, detections, CLASSES)
+        results.close(end_time=7201)
+
+        manifest = load_manifest(results.manifest_file)
+        filenames = [segment['filename'] for segment in manifest['segments']]
+        assert len(set(filenames)) == len(filenames) > 2
+        assert all(name.endswith('.csv.gz') for name in filenames[:-1])
+        assert sum(segment['rows'] for segment in manifest['segments']) \
+            == 106
+        assert sorted(os.listdir(path)) == sorted(
+            filenames + ['persons_3600.manifest.json'])
+        df = load_segments(results.manifest_file)
+        assert (df['label'] == 'person').sum() == 106
+        assert df['ts'].is_monotonic_increasing
+
+    def test_frame_stamps(self):
+        path = tempfile.mkdtemp()
+        results = DataHandler(measure="faces", path=path, method='csv')
+        results.makefile(verbose=False)
+        detections = np.zeros(2, dtype=DETECTION_DTYPE)
+        ns = time.monotonic_ns()
+        results.write_detections(results.start_time, detections, ['face'],
+                                 frame=41, ns=ns)
+        results.close()
+
+        df = pd.read_csv(results.filename)
+        assert df['frame'].tolist() == [0, 41, 41, 0]
+        # the videostart row anchors the monotonic clock to the wall clock
+        anchor = df.iloc[0]
+        wall = anchor['ts'] + (ns - anchor['ns']) / 1e9
+        assert abs(wall - time.time()) < 5
+        assert df['ns'].iloc[-1] >= ns
+        os.remove(results.filename)
+
 
 if __name__ == '__main__':
     unittest.main()
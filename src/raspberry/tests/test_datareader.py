@@ -1,4 +1,11 @@
-from utils.datareader import DataReader
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+from benchmark_reader import make_raw_data
+from utils.datahandler import DataHandler
+from utils.postprocess import DETECTION_DTYPE
+from utils.datareader import DataReader, count_ids, read_counts
 
 
 def test_datareader():
@@ -13,3 +20,107 @@ def test_datareader():
         'endX': 200
     }
     assert results.get_object_centroid(row) == 150
+
+
+def test_get_htr_data():
+    columns = ['ts', 'label', 'id', 'confidence', 'startX', 'startY', 'endX',
+               'endY']
+    faces = pd.DataFrame([
+        [100, 'face', 0, 0.9, 0, 0, 10, 10],
+        [100, 'face', 1, 0.9, 0, 0, 10, 10],
+        [103, 'face', 0, 0.9, 0, 0, 10, 10]], columns=columns)
+    persons = pd.DataFrame([
+        [100, 'person', 0, 0.9, 0, 0, 10, 10],
+        [100, 'person', 0, 0.8, 0, 0, 10, 10],
+        [102, 'person', 3, 0.9, 0, 0, 10, 10],
+        [104, 'person', 0, 0.9, 0, 0, 10, 10]], columns=columns)
+    results = DataReader(faces, persons, read_from='df')
+    htr = results.get_htr_data(time_format="unix")
+    # the timeframe spans the last second of both measures
+    assert htr['ts'].tolist() == [100, 101, 102, 103, 104]
+    assert htr['persons'].tolist() == [1, 0, 1, 0, 1]
+    # never more faces than persons in a second
+    assert htr['faces'].tolist() == [1, 0, 0, 0, 0]
+
+
+def test_lazy_views():
+    columns = ['ts', 'label', 'id', 'confidence', 'startX', 'startY', 'endX',
+               'endY']
+    faces = pd.DataFrame([[100, 'face', 0, 0.9, 0, 0, 10, 10],
+                          [102, 'face', 0, 0.9, 0, 0, 10, 10]],
+                         columns=columns)
+    persons = pd.DataFrame([[100, 'person', 0, 0.9, 0, 0, 10, 10],
+                            [101, 'person', 0, 0.9, 0, 0, 10, 10]],
+                           columns=columns)
+    results = DataReader(faces, persons, read_from='df')
+    # nothing is computed before it is used
+    assert results._cache == {}
+    htr = results.get_htr_data(time_format="unix")
+    assert results.get_htr_data(time_format="unix") is htr
+    assert 'x_axis_timeofday' not in results._cache
+    assert results.htr_data['ts'].tolist() == ['00:01:40', '00:01:41',
+                                               '00:01:42']
+
+    results.append(face_data=pd.DataFrame(
+        [[103, 'face', 1, 0.9, 0, 0, 10, 10]], columns=columns))
+    assert results._cache == {}
+    htr = results.get_htr_data(time_format="unix")
+    assert htr['ts'].tolist() == [100, 101, 102, 103]
+    assert htr['faces'].tolist() == [1, 0, 0, 0]
+
+
+def test_chunked_counts():
+    path = os.path.join(tempfile.mkdtemp(), 'faces.csv')
+    raw = make_raw_data(0.01, 'face', rate=2, start_time=100)
+    raw.to_csv(path, index=False)
+    counts = read_counts(path, chunksize=7)
+    assert counts.index.tolist() == list(range(100, 136))
+    assert counts.tolist() == count_ids(raw).tolist()
+
+    results = DataReader(path, path, chunksize=5)
+    assert results.raw_face_data is None
+    assert results.clean_face_data is None
+    assert results.clean_person_data is None
+    expected = DataReader(path, path)
+    pd.testing.assert_frame_equal(results.htr_data, expected.htr_data)
+
+
+def test_rollup_views():
+    faces = make_raw_data(0.5, 'face', rate=0.4, seed=0)
+    persons = make_raw_data(0.5, 'person', rate=0.8, seed=1)
+    filename = os.path.join(tempfile.mkdtemp(), 'rollup.db')
+    results = DataReader(faces, persons, read_from='df', rollup=filename)
+    htr = results.htr_data
+    expected = (htr['faces'] / htr['persons']).mean()
+    assert abs(results.avg_htr - expected) < 1e-12
+
+    X, Y1, Y2, title = results.plot_attr_for_bin("15Min")
+    htr = results.get_htr_data(time_format="unix")
+    bins = htr.groupby(htr['ts'] // 900)[['faces', 'persons']].sum()
+    assert Y1.tolist() == bins['faces'].tolist()
+    assert Y2.tolist() == (bins['persons'] - bins['faces']).tolist()
+    assert X[0] == pd.Timestamp('2018-10-09 01:30:00')
+    # the rollups are kept in the file
+    assert os.path.getsize(filename) > 0
+
+    # without a file the average does not build the rollups
+    results = DataReader(faces, persons, read_from='df')
+    assert abs(results.avg_htr - expected) < 1e-12
+    assert 'rollup' not in results._cache
+
+
+def test_sql_session():
+    path = tempfile.mkdtemp()
+    for start_time in [100, 200]:
+        for measure in ['faces', 'persons']:
+            handler = DataHandler(measure=measure, path=path, method='sql',
+                                  start_time=start_time)
+            handler.makefile(verbose=False)
+            detections = np.zeros(1, dtype=DETECTION_DTYPE)
+            handler.write_detections(start_time + 1, detections,
+                                     [measure[:-1]])
+            handler.close(end_time=start_time + 3)
+    db = handler.filename
+    results = DataReader(db, db, read_from='sql', session=200)
+    assert set(results.raw_person_data['ts']) == {200, 201, 203}
+    assert len(DataReader(db, db, read_from='sql').raw_face_data) == 6
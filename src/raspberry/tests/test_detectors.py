@@ -0,0 +1,67 @@
+import numpy as np
+from utils.detectors import PersonDetector, CascadeFaceDetector, CLASSES
+from utils.postprocess import DETECTION_DTYPE
+
+
+class FakeNet():
+    """Returns two detections per image in the batch"""
+    def setInput(self, blob):
+        self.batch = blob.shape[0]
+
+    def forward(self):
+        person = CLASSES.index('person')
+        rows = []
+        for n in range(self.batch):
+            rows.append([n, person, 0.9, 0.0, 0.0, 0.5, 0.5])
+            rows.append([n, person, 0.1 * n, 0.0, 0.0, 0.5, 0.5])
+        return np.array(rows, dtype=np.float32).reshape(1, 1, -1, 7)
+
+
+def make_detector():
+    detector = PersonDetector.__new__(PersonDetector)
+    detector.net = FakeNet()
+    detector.min_confidence = 0.5
+    return detector
+
+
+def test_detect_batch():
+    detector = make_detector()
+    frames = [np.zeros((300, 400, 3), dtype=np.uint8) for n in range(8)]
+    results = detector.detect_batch(frames)
+
+    assert len(results) == 8
+    assert [len(detections) for detections in results] == \
+        [1, 1, 1, 1, 1, 1, 2, 2]
+    assert results[7]['id'].tolist() == [0, 1]
+    assert results[0][0][['endX', 'endY']].tolist() == (200, 150)
+
+
+class FakeFaceNet():
+    """Returns one face in the middle of every crop"""
+    def setInput(self, blob):
+        self.batch = blob.shape[0]
+
+    def forward(self):
+        rows = [[n, 1, 0.9, 0.25, 0.25, 0.75, 0.75]
+                for n in range(self.batch)]
+        return np.array(rows, dtype=np.float32).reshape(1, 1, -1, 7)
+
+
+def test_cascade_face_detector():
+    detector = CascadeFaceDetector.__new__(CascadeFaceDetector)
+    detector.net = FakeFaceNet()
+    detector.min_confidence = 0.5
+    detector.padding = 0.0
+
+    frames = [np.zeros((300, 400, 3), dtype=np.uint8) for n in range(2)]
+    persons = np.zeros(1, dtype=DETECTION_DTYPE)
+    persons[0] = (7, CLASSES.index('person'), 0.9, 100, 50, 200, 290)
+    context = {'persons': [persons, persons[:0]]}
+    results = detector.detect_batch(frames, context=context)
+
+    assert [len(faces) for faces in results] == [1, 0]
+    face = results[0][0]
+    # the face is tied to the person and placed in frame coordinates
+    assert face['id'] == 7
+    assert face[['startX', 'startY', 'endX', 'endY']].tolist() == \
+        (125, 75, 175, 125)
@@ -0,0 +1,23 @@
+import numpy as np
+from utils.motion import MotionGate
+
+
+def test_motion_gate():
+    gate = MotionGate(sensitivity=0.01, max_skip=3)
+    empty = np.zeros((300, 400, 3), dtype=np.uint8)
+    person = empty.copy()
+    person[100:250, 150:220] = 200
+
+    # the first frame always runs
+    assert gate.has_motion(empty)
+    assert not gate.has_motion(empty)
+    assert gate.has_motion(person)
+    assert not gate.has_motion(person)
+    assert gate.gated == 2
+
+
+def test_motion_gate_max_skip():
+    gate = MotionGate(max_skip=2)
+    empty = np.zeros((300, 400, 3), dtype=np.uint8)
+    runs = [gate.has_motion(empty) for i in range(7)]
+    assert runs == [True, False, False, True, False, False, True]
@@ -0,0 +1,105 @@
+import numpy as np
+from utils.pipeline import FrameQueue, Pipeline
+from utils.postprocess import DETECTION_DTYPE
+from utils.runcontrol import RunControl
+from utils.motion import MotionGate
+
+
+class FakeSource():
+    def __init__(self, n):
+        self.n = n
+
+    def read(self):
+        if self.n == 0:
+            return (False, None)
+        self.n -= 1
+        return (True, np.zeros((240, 320, 3), dtype=np.uint8))
+
+
+class FakeDetector():
+    measure = 'faces'
+    labels = ['background', 'face']
+    input_size = (300, 300)
+
+    def __init__(self):
+        self.batch_sizes = []
+
+    def detect(self, frame, resized):
+        return np.zeros(1, dtype=DETECTION_DTYPE)
+
+    def detect_batch(self, frames, resized_frames, context=None):
+        self.batch_sizes.append(len(frames))
+        return [self.detect(frame, None) for frame in frames]
+
+
+class FakeHandler():
+    def __init__(self):
+        self.rows = 0
+
+        self.frames = []
+
+    def write_detections(self, ts, detections, labels, frame=0, ns=0):
+        self.rows += len(detections)
+        self.frames.append((frame, ns))
+
+
+def test_frame_queue_drop_oldest():
+    frames = FrameQueue(2, 'drop_oldest')
+    for i in range(5):
+        frames.put(i)
+    assert frames.dropped == 3
+    assert frames.max_depth == 2
+    assert [frames.get(), frames.get()] == [3, 4]
+
+
+def test_frame_queue_drop_newest():
+    frames = FrameQueue(2, 'drop_newest')
+    for i in range(5):
+        frames.put(i)
+    assert frames.dropped == 3
+    assert [frames.get(), frames.get()] == [0, 1]
+
+
+def test_pipeline():
+    handler = FakeHandler()
+    control = RunControl(signals=()).start()
+    pipeline = Pipeline(FakeSource(20), [FakeDetector()], [handler], control,
+                        queue_size=2, policy='block')
+    stats = pipeline.run()
+    assert stats['captured'] == 20
+    assert stats['processed'] == 20
+    assert stats['dropped'] == 0
+    assert handler.rows == 20
+    # frames keep their capture order, sequence number and monotonic stamp
+    (frames, stamps) = zip(*handler.frames)
+    assert list(frames) == list(range(20))
+    assert list(stamps) == sorted(stamps)
+    assert stats['capture_fps'] > 0
+
+
+def test_pipeline_batches():
+    handler = FakeHandler()
+    detector = FakeDetector()
+    control = RunControl(signals=()).start()
+    pipeline = Pipeline(FakeSource(20), [detector], [handler], control,
+                        policy='block', batch_size=8, max_wait=1.0)
+    stats = pipeline.run()
+    assert stats['processed'] == 20
+    assert sum(detector.batch_sizes) == 20
+    assert max(detector.batch_sizes) <= 8
+    assert stats['batches'] < 20
+    assert handler.rows == 20
+
+
+def test_pipeline_motion_gate():
+    handler = FakeHandler()
+    detector = FakeDetector()
+    control = RunControl(signals=()).start()
+    pipeline = Pipeline(FakeSource(20), [detector], [handler], control,
+                        policy='block', gate=MotionGate(max_skip=4))
+    stats = pipeline.run()
+    assert stats['processed'] == 20
+    assert stats['gated'] == 16
+    assert sum(detector.batch_sizes) == 4
+    # gated frames carry the last detections forward
+    assert handler.rows == 20
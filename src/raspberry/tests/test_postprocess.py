@@ -0,0 +1,34 @@
+import numpy as np
+from utils.postprocess import filter_detections, to_csv
+from utils.detectors import CLASSES, KEEP_CLASSES
+
+
+def make_detections(rows):
+    detections = np.zeros((1, 1, len(rows), 7), dtype=np.float32)
+    detections[0, 0] = rows
+    return detections
+
+
+def test_filter_detections():
+    person = CLASSES.index('person')
+    detections = make_detections([
+        [0, person, 0.9, 0.1, 0.2, 0.5, 0.6],
+        [0, person, 0.3, 0.1, 0.2, 0.5, 0.6],
+        [0, CLASSES.index('dog'), 0.9, 0.1, 0.2, 0.5, 0.6],
+        [0, person, 0.8, -0.1, 0.0, 1.2, 0.5]])
+    results = filter_detections(detections, 400, 300, 0.5, KEEP_CLASSES)
+
+    assert results['id'].tolist() == [0, 3]
+    assert results['class_id'].tolist() == [person, person]
+    assert results[0][['startX', 'startY', 'endX', 'endY']].tolist() == \
+        (40, 60, 200, 180)
+    # boxes are clipped to the frame
+    assert results[1][['startX', 'endX']].tolist() == (0, 399)
+
+
+def test_to_csv():
+    person = CLASSES.index('person')
+    detections = make_detections([[0, person, 0.9, 0.1, 0.2, 0.5, 0.6]])
+    results = filter_detections(detections, 400, 300)
+    assert to_csv(1539048822, results, CLASSES, 7, 123456789) == \
+        "1539048822,person,0,0.90,40,60,200,180,7,123456789,1,1,1\n"
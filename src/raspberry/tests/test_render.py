@@ -0,0 +1,61 @@
+import csv
+import os
+import tempfile
+import numpy as np
+from benchmark_reader import make_raw_data
+from render_report import main, REPORTS
+from utils.datareader import DataReader
+from utils.render import draw, minmax_indices
+
+
+def test_minmax_indices():
+    y = np.zeros(100)
+    y[[10, 55]] = [5, -5]
+    indices = minmax_indices(y, 4)
+    assert 10 in indices and 55 in indices
+    assert indices[0] == 0 and indices[-1] == 99
+    assert len(indices) <= 2 * 4 + 2
+    assert minmax_indices(y[:6], 4).tolist() == list(range(6))
+
+
+def test_bars_per_pixel():
+    ts = np.arange(86400)
+    series = {'faces': np.ones(86400), 'other persons': np.ones(86400)}
+    fig = draw(ts, series, kind='bar', figsize=(4, 2), dpi=50)
+    bars = fig.axes[0].patches
+    # one bar per series and pixel column at most, the day is kept
+    assert len(bars) <= 2 * 4 * 50
+    assert sum(bar.get_height() for bar in bars) == 2 * 86400
+    assert sum(bar.get_width() for bar in bars) >= 2 * 0.99
+
+    series = {name: y[:100] for name, y in series.items()}
+    fig = draw(ts[:100], series, kind='bar', figsize=(4, 2), dpi=50)
+    assert len(fig.axes[0].patches) == 2 * 100
+
+
+def test_export():
+    path = tempfile.mkdtemp()
+    results = DataReader(make_raw_data(0.5, 'face', rate=0.4, seed=0),
+                         make_raw_data(0.5, 'person', rate=0.8, seed=1),
+                         read_from='df')
+    png = results.export(os.path.join(path, 'faces.png'), metric='face')
+    with open(png, 'rb') as f:
+        assert f.read(8) == b'\x89PNG\r\n\x1a\n'
+    svg = results.plotbar(filename=os.path.join(path, 'htr.svg'))
+    assert b'<svg' in open(svg, 'rb').read()
+
+
+def test_render_report():
+    source = os.path.join(tempfile.mkdtemp(), 'door')
+    os.mkdir(source)
+    for measure, seed in [('faces', 0), ('persons', 1)]:
+        make_raw_data(0.1, measure[:-1], seed=seed, start_time=1000).to_csv(
+            os.path.join(source, f'{measure}_1000.csv'), index=False)
+    output = os.path.join(tempfile.mkdtemp(), 'report')
+    main(source, output=output)
+    with open(os.path.join(output, 'report.csv')) as f:
+        rows = list(csv.reader(f))
+    assert rows[1][:2] == ['door', '1000']
+    for name in rows[1][3:]:
+        assert os.path.getsize(os.path.join(output, name)) > 0
+    assert len(rows[1]) == 3 + len(REPORTS)
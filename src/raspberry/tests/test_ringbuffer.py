@@ -0,0 +1,82 @@
+import os
+import tempfile
+import numpy as np
+from utils.datahandler import DataHandler, RECORD_DTYPE, LABEL_CODES
+from utils.postprocess import DETECTION_DTYPE
+from utils.ringbuffer import RingBuffer, RingReader
+
+
+def make_records(ts):
+    records = np.zeros(len(ts), dtype=RECORD_DTYPE)
+    records['ts'] = ts
+    return records
+
+
+def test_ring_readers():
+    filename = os.path.join(tempfile.mkdtemp(), 'test.ring')
+    ring = RingBuffer(filename, capacity=8)
+    ring.write(make_records([1, 2, 3]))
+
+    late = RingReader(filename)
+    early = RingReader(filename, from_start=True)
+    assert early.read()['ts'].tolist() == [1, 2, 3]
+    assert late.read()['ts'].tolist() == []
+
+    ring.write(make_records([4, 5]))
+    assert late.read()['ts'].tolist() == [4, 5]
+    assert early.read()['ts'].tolist() == [4, 5]
+    assert early.read()['ts'].tolist() == []
+
+
+def test_ring_overrun():
+    filename = os.path.join(tempfile.mkdtemp(), 'test.ring')
+    ring = RingBuffer(filename, capacity=4)
+    reader = RingReader(filename)
+    ring.write(make_records([1, 2, 3]))
+    ring.write(make_records([4, 5, 6]))
+    assert reader.read()['ts'].tolist() == [3, 4, 5, 6]
+    assert reader.lost == 2
+
+    # a new writer keeps the head, so the reader continues
+    ring.close()
+    ring = RingBuffer(filename, capacity=4)
+    ring.write(make_records(list(range(7, 17))))
+    assert reader.read()['ts'].tolist() == [13, 14, 15, 16]
+    assert reader.lost == 8
+
+
+def test_datahandler_publishes():
+    path = tempfile.mkdtemp()
+    ring = RingBuffer(os.path.join(path, 'test.ring'), capacity=16)
+    reader = RingReader(ring.filename)
+    results = DataHandler(measure="faces", path=path, method='csv',
+                          start_time=1539048822, buffered=True, ring=ring)
+    results.makefile(verbose=False)
+    results.write_detections(1539048823, np.zeros(2, dtype=DETECTION_DTYPE),
+                             ['face'])
+    # published before the buffered rows are committed
+    records = reader.read()
+    assert records['label'].tolist() == [LABEL_CODES['videostart'],
+                                         LABEL_CODES['face'],
+                                         LABEL_CODES['face']]
+    results.close(end_time=1539048824)
+    assert reader.read()['ts'].tolist() == [1539048824]
+
+
+def test_single_writer():
+    filename = os.path.join(tempfile.mkdtemp(), 'test.ring')
+    ring = RingBuffer(filename, capacity=8)
+    ring.write(make_records([1, 2]))
+    try:
+        RingBuffer(filename, capacity=8)
+        assert False, "a second writer must fail"
+    except IOError:
+        pass
+    # the ring of the first writer is untouched
+    assert RingReader(filename, from_start=True).read()['ts'].tolist() \
+        == [1, 2]
+
+    ring.close()
+    RingBuffer(filename, capacity=8).write(make_records([3]))
+    assert RingReader(filename, from_start=True).read()['ts'].tolist() \
+        == [1, 2, 3]
@@ -0,0 +1,37 @@
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+from utils.rollup import RollupStore, to_seconds
+
+
+def make_htr(start, faces, persons):
+    return pd.DataFrame(data={'ts': np.arange(start, start + len(faces)),
+                              'faces': faces, 'persons': persons})
+
+
+def test_rollup_store():
+    filename = os.path.join(tempfile.mkdtemp(), 'rollup.db')
+    store = RollupStore(filename)
+    # 86398 .. 86401 crosses a day, an hour and a minute
+    store.add(make_htr(86398, [1, 0, 1, 2], [2, 0, 1, 2]))
+    assert store.sums(86398, 86401)['persons'] == 5
+    assert store.avg_htr() == (0.5 + 1 + 1) / 3
+
+    # the seconds that are added again replace the old ones
+    store.add(make_htr(86400, [0, 1], [3, 2]))
+    store.close()
+    store = RollupStore(filename)
+    day = store.query(resolution=86400)
+    assert day['ts'].tolist() == [0, 86400]
+    assert day['persons'].tolist() == [2, 5]
+    assert day['person_seconds'].tolist() == [1, 2]
+    assert store.avg_htr(86399, 86401) == 0.25
+    assert store.avg_htr(1, 5) != store.avg_htr(1, 5)  # nan
+
+    bins = store.binned(to_seconds('1Min'))
+    assert bins['ts'].tolist() == [86340, 86400]
+    assert bins['persons'].tolist() == [2, 5]
+    bins = store.binned(120, start=86300, end=86600)
+    assert bins['ts'].tolist() == [86280, 86400, 86520]
+    assert bins['faces'].tolist() == [1, 1, 0]
@@ -0,0 +1,16 @@
+from utils.runcontrol import RunControl
+
+
+def test_max_frames():
+    control = RunControl(max_frames=2, signals=()).start()
+    assert not control.should_stop()
+    control.tick()
+    control.tick()
+    assert control.should_stop()
+
+
+def test_stop():
+    control = RunControl(duration=3600, signals=()).start()
+    assert not control.should_stop()
+    control.stop()
+    assert control.should_stop()
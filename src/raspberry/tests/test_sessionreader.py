@@ -0,0 +1,88 @@
+import os
+import tempfile
+import numpy as np
+from utils.datahandler import DataHandler
+from utils.datareader import DataReader
+from utils.postprocess import DETECTION_DTYPE
+from utils.sessionreader import SessionReader, find_sessions
+from utils.tailreader import TailReader
+
+
+def record(path, start_time, persons, faces, method='csv'):
+    """Writes one session with the given ids per second"""
+    handlers = [DataHandler(measure=measure, path=path, method=method,
+                            start_time=start_time)
+                for measure in ['faces', 'persons']]
+    for handler, ids in zip(handlers, [faces, persons]):
+        handler.makefile(verbose=False)
+        for ts, n in enumerate(ids, start_time):
+            detections = np.zeros(n, dtype=DETECTION_DTYPE)
+            detections['id'] = np.arange(n)
+            handler.write_detections(ts, detections,
+                                     [handler.measure[:-1]])
+        handler.close(end_time=start_time + len(ids))
+
+
+def make_cameras():
+    root = tempfile.mkdtemp()
+    for name in ['door', 'window']:
+        os.mkdir(os.path.join(root, name))
+    # the videostart and videoend markers are not counted
+    record(os.path.join(root, 'door'), 100, [0, 2, 2, 0], [0, 1, 3, 0])
+    record(os.path.join(root, 'door'), 200, [0, 1, 0], [0, 1, 0], 'bin')
+    record(os.path.join(root, 'window'), 102, [0, 4, 0], [0, 1, 0])
+    return root
+
+
+def test_find_sessions():
+    root = make_cameras()
+    sessions = find_sessions(root)
+    assert [(s['camera'], s['session']) for s in sessions] == [
+        ('door', 100), ('door', 200), ('window', 102)]
+    assert find_sessions(os.path.join(root, '*', 'persons_102.csv')) \
+        == sessions[2:]
+    assert find_sessions(root, camera='door') == sessions[:2]
+
+
+def test_session_reader():
+    root = make_cameras()
+    results = SessionReader(root, time_range=(101, 150), processes=2)
+    assert results.cameras == ['door', 'window']
+    htr = results.get_htr_data(time_format="unix", by_camera=True)
+    door = htr[htr['camera'] == 'door']
+    assert door['ts'].tolist() == [101, 102, 103]
+    assert door['persons'].tolist() == [2, 2, 0]
+    assert door['faces'].tolist() == [1, 2, 0]
+
+    htr = results.get_htr_data(time_format="unix")
+    assert htr['persons'].tolist() == [2, 2, 4]
+    assert htr['faces'].tolist() == [1, 2, 1]
+    avg = results.get_avg_htr(by_camera=True)
+    assert avg['door'] == 0.75
+    assert avg['window'] == 0.25
+
+    # the door session at 200 starts after the window and is not read
+    assert [s['session'] for s in results.sessions] == [100, 102]
+    assert SessionReader(root, camera='door', processes=1) \
+        .get_htr_data("unix")['ts'].tolist() == list(range(101, 202))
+
+
+def test_readers_agree():
+    path = tempfile.mkdtemp()
+    record(path, 100, [0, 2, 1, 1], [0, 1, 1, 0])
+    (faces, persons) = (os.path.join(path, f"{measure}_100.csv")
+                        for measure in ['faces', 'persons'])
+    tail = TailReader(faces, persons)
+    tail.update()
+    readers = [DataReader(faces, persons),
+               DataReader(faces, persons, chunksize=2),
+               SessionReader(path, processes=1), tail]
+    for results in readers:
+        htr = results.get_htr_data(time_format="unix")
+        assert htr['ts'].tolist() == [101, 102, 103]
+        assert htr['persons'].tolist() == [2, 1, 1]
+        assert htr['faces'].tolist() == [1, 1, 0]
+    assert [DataReader(faces, persons).avg_htr,
+            DataReader(faces, persons, chunksize=2).avg_htr,
+            SessionReader(path, processes=1).get_avg_htr(),
+            tail.avg_htr] == [0.5] * 4
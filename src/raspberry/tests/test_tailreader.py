@@ -0,0 +1,54 @@
+import os
+import tempfile
+import numpy as np
+from utils.datahandler import DataHandler
+from utils.postprocess import DETECTION_DTYPE
+from utils.tailreader import FileTail, TailReader
+
+
+def test_file_tail_partial_line():
+    filename = os.path.join(tempfile.mkdtemp(), 'faces_1.csv')
+    tail = FileTail(filename)
+    assert tail.read() is None
+
+    with open(filename, 'w') as f:
+        f.write("ts,label,id,confidence,startX,startY,endX,endY\n")
+        f.write("1,videostart,0,0,0,0,0,0\n2,face,0,0.9")
+    assert tail.read()['ts'].tolist() == [1]
+
+    # the partial line is read once it is complete
+    with open(filename, 'a') as f:
+        f.write("0,1,2,3,4\n3,face,1,0.8,1,2,3,4\n")
+    df = tail.read()
+    assert df['ts'].tolist() == [2, 3]
+    assert df['confidence'].tolist() == [0.9, 0.8]
+    assert tail.read() is None
+
+
+def test_tail_reader():
+    path = tempfile.mkdtemp()
+    faces = DataHandler(measure="faces", path=path, start_time=100)
+    persons = DataHandler(measure="persons", path=path, start_time=100)
+    faces.makefile(verbose=False)
+    persons.makefile(verbose=False)
+    results = TailReader(faces.filename, persons.filename, window=2)
+
+    two = np.zeros(2, dtype=DETECTION_DTYPE)
+    two['id'] = [0, 1]
+    one = two[:1]
+    persons.write_detections(101, two, ['background', 'person'])
+    faces.write_detections(101, one, ['background', 'face'])
+    assert results.update() == 3
+    assert results.avg_htr == 0.5
+
+    # more rows of an open second do not count an id twice
+    persons.write_detections(101, two, ['background', 'person'])
+    faces.write_detections(101, two, ['background', 'face'])
+    persons.write_detections(104, one, ['background', 'person'])
+    results.update()
+    htr = results.get_htr_data(time_format="unix")
+    assert htr['ts'].tolist() == [101, 102, 103, 104]
+    assert htr['faces'].tolist() == [2, 0, 0, 0]
+    assert htr['persons'].tolist() == [2, 0, 0, 1]
+    assert results.closed_ts == 102
+    assert results.avg_htr == 0.5
@@ -0,0 +1,56 @@
+import os
+import numpy as np
+import pandas as pd
+import cv2
+from utils.postprocess import DETECTION_DTYPE
+from utils.videofile import split_segments, measure_video
+
+
+class FakeFaceDetector():
+    measure = 'faces'
+    labels = ['background', 'face']
+    input_size = (300, 300)
+
+    def __init__(self, prototxt, model, min_confidence=0.5):
+        pass
+
+    def detect(self, frame, resized):
+        return np.ones(1, dtype=DETECTION_DTYPE)
+
+    def detect_batch(self, frames, resized_frames, context=None):
+        return [self.detect(frame, None) for frame in frames]
+
+
+def make_video(filename, n_frames, fps=10):
+    writer = cv2.VideoWriter(filename, cv2.VideoWriter_fourcc(*'MJPG'), fps,
+                             (64, 48))
+    for i in range(n_frames):
+        writer.write(np.full((48, 64, 3), i, dtype=np.uint8))
+    writer.release()
+
+
+def test_split_segments():
+    assert split_segments(10, 3) == [(0, 3), (3, 6), (6, 10)]
+    assert split_segments(2, 4) == [(0, 1), (1, 2)]
+
+
+def test_measure_video(tmpdir):
+    video = os.path.join(str(tmpdir), 'video.avi')
+    make_video(video, 40)
+    detectors = [(FakeFaceDetector, None, None, 0.5)]
+    merged = measure_video(video, detectors, path=str(tmpdir),
+                           start_time=1539048822, processes=2, segments=3)
+
+    df = pd.read_csv(merged[0])
+    faces = df[df['label'] == 'face']
+    # one row per frame, in order, stamped with the video time
+    assert len(faces) == 40
+    assert faces['ts'].is_monotonic_increasing
+    assert faces['ts'].iloc[0] == 1539048822
+    assert faces['ts'].iloc[-1] == 1539048825
+    # the frame column is the index of the frame in the video
+    assert faces['frame'].tolist() == list(range(40))
+    assert df['label'].iloc[-1] == 'videoend'
+    # the scratch segment files are removed
+    assert sorted(os.listdir(str(tmpdir))) == ['faces_1539048822.csv',
+                                               'video.avi']